@@ -0,0 +1,258 @@
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+import forecasting
+
+# ============================================
+# Analytics
+# ============================================
+# Everything the dashboard shows, as plain frames, series and dicts computed
+# from a query backend (see query_backend). Nothing here touches Streamlit, so
+# the same calls serve the dashboard, the benchmarks and any other caller.
+#
+# With a `cache` (a QueryCache) every result is memoised per backend, data
+# version, distinct-count mode, call and filters; cached results are shared, so
+# callers must not mutate them. With `timings` (a SpanRecorder) each backend
+# query is recorded as a `query.<name>` span.
+MONTH_LABELS = {month: name[:3] for month, name in enumerate(data_loader.MONTH_NAMES, start=1)}
+FORECAST_LABELS = {13: 'Jan 26', 14: 'Feb 26', 15: 'Mar 26'}
+FORECAST_HORIZON = 3
+
+# Time charts show sales per day, ISO week or month; each is summed from the
+# daily rollup (see data_loader.roll_up) except months, which come from the cube's
+# Month so they line up with the batched per-series forecasts. Forecasts at the
+# finer grains cover about the same quarter as the monthly one.
+GRANULARITIES = {'day': 'Daily', 'week': 'Weekly', 'month': 'Monthly'}
+PERIOD_FORMATS = {'day': '%Y-%m-%d', 'week': '%G-W%V'}
+FORECAST_HORIZONS = {'day': 91, 'week': 13, 'month': FORECAST_HORIZON}
+
+def month_label(month):
+    return MONTH_LABELS.get(month) or FORECAST_LABELS.get(month, f'Month {month}')
+
+# ============================================
+# Rankings
+# ============================================
+# Leaderboards rank aggregates (one value per city, product...) rather than rows.
+# A partition finds the k-th largest value in O(groups) and only the k selected
+# groups are sorted, so a top 10 out of thousands of SKUs never sorts them all.
+# The store folds appended rows into the aggregates, so after an append a
+# ranking is recomputed for the new data version from those, without a scan.
+def top_k(values, k):
+    """Positions of the ``k`` largest values, largest first; ties keep their original order."""
+    values = np.asarray(values)
+    k = min(k, len(values))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    threshold = np.partition(values, len(values) - k)[len(values) - k]
+    above = np.flatnonzero(values > threshold)
+    candidates = np.concatenate([above, np.flatnonzero(values == threshold)[:k - len(above)]])
+    return candidates[np.lexsort((candidates, -values[candidates]))]
+
+def rank(result, n=None, by=None):
+    """The ``n`` largest entries of a series, or rows of a frame by column ``by`` (all with n=None).
+
+    Returns {'descending': ..., 'ascending': ...} from a single selection, the
+    ascending order being a reversed view of the descending one. Series come
+    back as frames with their index as the first column.
+    """
+    values = result if by is None else result[by]
+    top = result.iloc[top_k(values.to_numpy(), len(result) if n is None else n)]
+    if by is None:
+        top = top.reset_index()
+    return {'descending': top, 'ascending': top.iloc[::-1]}
+
+class Analytics:
+    def __init__(self, backend, cache=None, timings=None, namespace=None):
+        self.backend = backend
+        self.cache = cache
+        self.timings = timings
+        self.namespace = namespace or type(backend).__name__
+
+    def cached(self, name, filters, compute, *args):
+        if self.cache is None:
+            return compute()
+        key = (self.namespace, self.backend.version, self.backend.distinct_mode, name,
+               tuple(sorted(filters.items())), args)
+        return self.cache.get_or_compute(key, compute)
+
+    def query(self, name, filters):
+        """A named backend query (query_backend.QUERY_NAMES)."""
+        span = self.timings.span(f'query.{name}') if self.timings else nullcontext()
+        with span:
+            return self.cached(name, filters, lambda: self.backend.run(name, filters))
+
+    def filter_options(self):
+        return self.backend.filter_options()
+
+    def date_min(self):
+        return self.backend.date_min()
+
+    def data_version(self):
+        """The backend's data version and when its source last changed (seconds since the epoch)."""
+        return self.backend.version, self.backend.updated_at
+
+    def kpis(self, filters):
+        totals = self.query('totals', filters)
+        orders = self.query('distinct_orders', filters)
+        return {
+            'revenue': totals['Sales'],
+            'units': totals['Quantity Ordered'],
+            'order_lines': totals['Order Lines'],
+            'orders': orders,
+            'aov': totals['Sales'] / max(orders, 1),
+        }
+
+    def growth_projection(self, filters, growth_rate):
+        """Current revenue and the revenue after ``growth_rate`` percent growth."""
+        current = self.query('totals', filters)['Sales']
+        return current, current * (1 + growth_rate / 100)
+
+    def monthly_sales(self, filters):
+        """Month, Sales and Month_Label ('Jan'...) per month with sales."""
+        def compute():
+            monthly = self.query('monthly_sales', filters).reset_index()
+            monthly['Month_Label'] = monthly['Month'].map(MONTH_LABELS)
+            return monthly
+        return self.cached('analytics.monthly_sales', filters, compute)
+
+    def sales_over_time(self, filters, granularity='month'):
+        """Period, Sales and Label (for the x axis) per day, ISO week or month.
+
+        Days and weeks run from the first to the last day with sales, empty
+        periods as 0; months are those with sales, Period being the month number.
+        """
+        def compute():
+            if granularity == 'month':
+                monthly = self.monthly_sales(filters)
+                return pd.DataFrame({'Period': monthly['Month'], 'Sales': monthly['Sales'], 'Label': monthly['Month_Label']})
+            sales = data_loader.roll_up(self.query('daily_sales', filters), granularity)
+            return pd.DataFrame({'Period': sales.index, 'Sales': sales.to_numpy(),
+                                 'Label': sales.index.strftime(PERIOD_FORMATS[granularity])})
+        return self.cached('analytics.sales_over_time', filters, compute, granularity)
+
+    def hourly_sales(self, filters):
+        return self.cached('analytics.hourly_sales', filters,
+                           lambda: self.query('hourly_sales', filters).reset_index())
+
+    def ranking(self, filters, name, n=None, by=None):
+        """The ``n`` largest groups of a named query, both orderings (see rank)."""
+        return self.cached('analytics.ranking', filters, lambda: rank(self.query(name, filters), n, by), name, n, by)
+
+    def city_leaderboard(self, filters, n=5):
+        """The ``n`` highest-revenue cities, ascending so the largest bar is drawn last."""
+        return self.ranking(filters, 'city_sales', n)['ascending']
+
+    def top_products(self, filters, n=10):
+        return self.ranking(filters, 'product_sales', n)['ascending']
+
+    def city_performance(self, filters, n=None):
+        """City, Revenue, Units, Orders and Share (percent of all revenue) of the ``n`` top cities, both orderings."""
+        def compute():
+            performance = self.query('city_performance', filters).copy()
+            performance['Share'] = performance['Revenue'] / performance['Revenue'].sum() * 100
+            return rank(performance, n, 'Revenue')
+        return self.cached('analytics.city_performance', filters, compute, n)
+
+    def heatmap(self, filters):
+        """Sales by Day_of_Week (rows, Monday first) and Hour (columns)."""
+        return self.query('heatmap', filters)
+
+    def product_stats(self, filters):
+        """Product, Revenue, Units and Orders, ascending by revenue."""
+        return self.ranking(filters, 'product_stats', by='Revenue')['ascending']
+
+    def highlights(self, filters):
+        """Top city and product, and the peak month, day and hour."""
+        def compute():
+            return {
+                'top_city': self.query('city_sales', filters).idxmax(),
+                'top_product': self.query('product_units', filters).idxmax(),
+                'peak_month': MONTH_LABELS.get(self.query('monthly_sales', filters).idxmax(), 'N/A'),
+                'peak_day': self.query('day_sales', filters).idxmax(),
+                'peak_hour': self.query('hourly_sales', filters).idxmax(),
+            }
+        return self.cached('analytics.highlights', filters, compute)
+
+    def series_forecasts(self, model='linear'):
+        """History, forecast and backtest accuracy of every City / Product series (see forecasting).
+
+        Fitted in one batch for all series and cached per data version, so any
+        filter's forecast is a lookup.
+        """
+        def compute():
+            series = forecasting.series_matrix(self.query('series_sales', {}))
+            return {
+                'series': series,
+                'forecast': forecasting.forecast_series(series, model, FORECAST_HORIZON),
+                'backtest': forecasting.backtest_series(series, model, FORECAST_HORIZON),
+            }
+        return self.cached('analytics.series_forecasts', {}, compute, model)
+
+    def forecast_models(self, granularity='month'):
+        """The forecasting models the sales history supports; the seasonal model is monthly only."""
+        if granularity != 'month':
+            return [model for model in forecasting.MODELS if model != 'seasonal']
+        return forecasting.available_models(self.series_forecasts()['series'].shape[1])
+
+    def complete_periods(self, filters, history, granularity):
+        """Which history periods the sales span covers in full; a part-week at either end would read as a slump."""
+        complete = np.ones(len(history), dtype=bool)
+        if granularity == 'week' and len(history):
+            days = self.query('daily_sales', filters).index
+            complete[0] &= days[0] <= history['Period'].iloc[0]
+            complete[-1] &= days[-1] >= history['Period'].iloc[-1] + pd.Timedelta(days=6)
+        return complete
+
+    def forecast(self, filters, model='linear', granularity='month'):
+        """The filtered slice's sales per period and its forecast over the next FORECAST_HORIZONS periods.
+
+        Returns the history (see sales_over_time), the forecast periods, labels
+        and values, and the model's backtest accuracy for the slice. Monthly
+        forecasts are looked up in series_forecasts; daily and weekly ones fit
+        the slice's own series. The forecast is empty with a Month filter (at
+        monthly granularity) or too little history for the model.
+        """
+        def compute():
+            history = self.sales_over_time(filters, granularity)
+            periods, labels, values, accuracy = [], [], np.empty(0), None
+            if granularity == 'month':
+                if 'Month' not in filters and len(history) >= forecasting.min_history(model):
+                    batch = self.series_forecasts(model)
+                    key = (filters.get('City', forecasting.ALL), filters.get('Product', forecasting.ALL))
+                    periods = list(batch['forecast'].columns)
+                    labels = [month_label(month) for month in periods]
+                    values = batch['forecast'].loc[key].to_numpy()
+                    accuracy = batch['backtest'].loc[key].to_dict()
+            else:
+                complete = np.flatnonzero(self.complete_periods(filters, history, granularity))
+                sales = history['Sales'].to_numpy()[complete]
+                # Part-periods at the ends are left out, so the check is on what is fitted
+                if len(sales) >= forecasting.min_history(model):
+                    horizon = FORECAST_HORIZONS[granularity]
+                    # Fit complete periods only, then drop the forecasts of a part-period the history already shows
+                    skipped = len(history) - 1 - complete[-1]
+                    series = pd.DataFrame([sales], columns=np.arange(len(sales)))
+                    values = forecasting.forecast_series(series, model, horizon + skipped).iloc[0].to_numpy()[skipped:]
+                    # Origins a horizon apart keep the daily backtest to a handful of refits
+                    accuracy = forecasting.backtest_series(series, model, horizon, step=horizon).iloc[0].to_dict()
+                    periods = pd.date_range(history['Period'].iloc[-1], periods=horizon + 1,
+                                            freq=data_loader.PERIOD_FREQUENCIES[granularity])[1:]
+                    labels = list(periods.strftime(PERIOD_FORMATS[granularity]))
+                    periods = list(periods)
+            return {
+                'history': history,
+                'model': model,
+                'granularity': granularity,
+                'periods': periods,
+                'labels': labels,
+                'values': values,
+                'accuracy': accuracy,
+            }
+        return self.cached('analytics.forecast', filters, compute, model, granularity)
+
+    def worksheet(self, filters, search='', min_quantity=1, **page):
+        """One page of matching rows and whether another page follows (see PandasBackend.worksheet)."""
+        return self.backend.worksheet(filters, search, min_quantity, cache=self.cache, **page)
@@ -0,0 +1,297 @@
+"""Headless benchmarks for the sales dashboard.
+
+Generates synthetic ``Sales Data.csv`` files of the requested sizes and times
+loading, every named query over a sample of City/Month/Product filter sets, and
+full dashboard reruns through Streamlit's AppTest (per-stage timings come from
+the dashboard's own spans). Results are written as a JSON report; pass an
+earlier report to --compare to print the change per metric.
+
+    python benchmark.py --rows 100k 1m --output report.json
+    python benchmark.py --rows 10m --compare report.json
+"""
+import argparse
+import glob
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+import forecasting
+import query_backend
+from analytics import Analytics
+from instrumentation import SpanRecorder
+
+# ============================================
+# Synthetic Data
+# ============================================
+PRODUCTS = {
+    'USB-C Charging Cable': 11.95, 'Lightning Charging Cable': 14.95, 'AAA Batteries (4-pack)': 2.99,
+    'AA Batteries (4-pack)': 3.84, 'Wired Headphones': 11.99, 'Apple Airpods Headphones': 150.0,
+    'Bose SoundSport Headphones': 99.99, '27in FHD Monitor': 149.99, 'iPhone': 700.0,
+    '27in 4K Gaming Monitor': 389.99, '34in Ultrawide Monitor': 379.99, 'Google Phone': 600.0,
+    'Flatscreen TV': 300.0, 'Macbook Pro Laptop': 1700.0, 'ThinkPad Laptop': 999.99,
+    '20in Monitor': 109.99, 'Vareebadd Phone': 400.0, 'LG Washing Machine': 600.0, 'LG Dryer': 600.0,
+}
+CITIES = [' San Francisco', ' Los Angeles', ' New York City', ' Boston', ' Atlanta',
+          ' Dallas', ' Seattle', ' Portland', ' Austin']
+GENERATE_CHUNK_ROWS = 1_000_000
+
+def parse_rows(text):
+    """'100k' -> 100000, '1m' -> 1000000."""
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1].lower(), 1)
+    return int(float(text.rstrip('kKmM')) * multiplier)
+
+def generate_sales_csv(path, rows, seed=0, chunk_rows=GENERATE_CHUNK_ROWS):
+    """Write ``rows`` synthetic order lines with the Sales Data.csv columns, a chunk at a time."""
+    rng = np.random.default_rng(seed)
+    names = np.array(list(PRODUCTS))
+    prices = np.array(list(PRODUCTS.values()))
+    # Cheap accessories sell far more often than laptops and appliances
+    product_weights = 1 / np.sqrt(prices)
+    product_weights /= product_weights.sum()
+    # Orders peak around midday and in the evening
+    hour_weights = np.array([1, 1, 1, 1, 1, 2, 3, 5, 7, 9, 11, 12, 13, 12, 11, 10, 10, 11, 13, 14, 13, 10, 6, 3], dtype=float)
+    hour_weights /= hour_weights.sum()
+    start = np.datetime64('2019-01-01T00:00')
+    tmp = f'{path}.{os.getpid()}.tmp'
+    order_id = 176558
+    with open(tmp, 'w', newline='') as f:
+        for offset in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - offset)
+            product = rng.choice(len(names), n, p=product_weights)
+            minutes = (rng.integers(0, 365, n) * 24 * 60 + rng.choice(24, n, p=hour_weights) * 60
+                       + rng.integers(0, 60, n))
+            # Roughly one order in ten has a second line
+            order_ids = order_id + np.cumsum(rng.random(n) > 0.1)
+            order_id = int(order_ids[-1]) + 1
+            order_dates = pd.DatetimeIndex(start + minutes.astype('timedelta64[m]'))
+            chunk = pd.DataFrame({
+                'Order ID': order_ids,
+                'Product': names[product],
+                'Quantity Ordered': rng.choice([1, 2, 3, 4], n, p=[0.9, 0.07, 0.02, 0.01]),
+                'Price Each': prices[product],
+                'Order Date': order_dates,
+                'City': np.array(CITIES)[rng.integers(0, len(CITIES), n)],
+                'Month': order_dates.month,
+                'Hour': order_dates.hour,
+            })
+            chunk.to_csv(f, index=False, header=offset == 0, date_format='%Y-%m-%d %H:%M:%S')
+    os.replace(tmp, path)
+
+def dataset_path(data_dir, rows, seed):
+    path = os.path.join(data_dir, f'sales_{rows}_seed{seed}.csv')
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"Generating {rows:,} rows -> {path}", file=sys.stderr)
+        generate_sales_csv(path, rows, seed)
+    return path
+
+# ============================================
+# Timing
+# ============================================
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def span_report(recorder):
+    return {row['Stage']: {'samples': int(row['Samples']), 'p50_ms': round(row['p50 (ms)'], 3),
+                           'p95_ms': round(row['p95 (ms)'], 3)}
+            for _, row in recorder.stats().iterrows()}
+
+def filter_sets(options, limit, seed=0):
+    """No filter, every single-column filter, then a sample of the full combinations up to ``limit``."""
+    columns = list(options)
+    sets = [{}] + [{column: value} for column in columns for value in options[column]]
+    combinations = [dict(zip(columns, values)) for values in itertools.product(*(options[c] for c in columns))]
+    if limit and len(sets) + len(combinations) > limit:
+        combinations = random.Random(seed).sample(combinations, max(limit - len(sets), 0))
+    return sets + combinations
+
+def bench_load(path, snapshot_dir, streaming):
+    base, meta_file = data_loader.snapshot_paths(path, snapshot_dir)
+    shared_base, shared_meta = data_loader.shared_paths(
+        data_loader.resolve_sources(path), data_loader.source_version(path), snapshot_dir)
+    for stale in ([meta_file, shared_meta] + glob.glob(glob.escape(base) + '.*.arrow')
+                  + glob.glob(glob.escape(shared_base) + '.*')):
+        if os.path.exists(stale):
+            os.remove(stale)
+    results = {}
+    store = data_loader.SalesStore(path, streaming=streaming, snapshot_dir=snapshot_dir)
+    state, results['cold_s'] = timed(store.refresh)
+    if not streaming:
+        _, results['snapshot_s'] = timed(data_loader.SalesStore(path, snapshot_dir=snapshot_dir, shared=False).refresh)
+        _, results['shared_s'] = timed(data_loader.SalesStore(path, snapshot_dir=snapshot_dir).refresh)
+        results['memory_mb'] = round(data_loader.memory_usage_mb(state['df']), 1)
+    results['refresh_unchanged_s'] = timed(store.refresh)[1]
+    return state, {key: round(value, 4) if isinstance(value, float) else value for key, value in results.items()}
+
+ANALYTICS_CALLS = ['kpis', 'monthly_sales', 'hourly_sales', 'city_leaderboard', 'top_products',
+                   'city_performance', 'heatmap', 'product_stats', 'highlights', 'forecast']
+
+def bench_queries(backend, sets):
+    """Every named query, every analytics call and the worksheet, uncached, over each filter set."""
+    recorder = SpanRecorder(window=len(sets))
+    analytics = Analytics(backend)
+    for filters in sets:
+        for name in query_backend.QUERY_NAMES:
+            with recorder.span(f'query.{name}'):
+                backend.run(name, filters)
+        for name in ANALYTICS_CALLS:
+            with recorder.span(f'analytics.{name}'):
+                getattr(analytics, name)(filters)
+        with recorder.span('worksheet.page'):
+            backend.worksheet(filters)
+        with recorder.span('worksheet.search_sorted'):
+            backend.worksheet(filters, 'usb', 2, sort='Sales', ascending=False)
+    # Fitting and backtesting every City / Product series in one batch, per model
+    for model in forecasting.available_models(analytics.series_forecasts()['series'].shape[1]):
+        with recorder.span(f'forecast.{model}'):
+            analytics.series_forecasts(model)
+    return span_report(recorder)
+
+def bench_app(path, data_dir, reruns, env):
+    """Cold and warm full reruns of dashboard.py, with per-stage spans from its instrumentation."""
+    from streamlit.testing.v1 import AppTest
+    import streamlit as st
+
+    spans_file = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False).name
+    dashboard = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard.py')
+    saved_env, saved_cwd = dict(os.environ), os.getcwd()
+    os.environ.update(env, SALES_DATA_SOURCE=os.path.abspath(path), LAZY_TABS='0',
+                      TIMING_EXPORT_PATH=spans_file, TIMING_EXPORT_FORMAT='jsonl')
+    os.chdir(data_dir)  # the dashboard keeps its snapshots under ./.cache
+    try:
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        app = AppTest.from_file(dashboard, default_timeout=3600)
+        runs = []
+        for _ in range(reruns + 1):
+            _, seconds = timed(app.run)
+            if app.exception:
+                raise RuntimeError(f"dashboard.py failed: {app.exception[0].value}")
+            runs.append(seconds)
+    finally:
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+
+    spans = pd.read_json(spans_file, lines=True)
+    os.remove(spans_file)
+    first_run = spans['run'].iloc[0]
+    report = {'first_run_s': round(runs[0], 4), 'rerun_p50_s': round(float(np.median(runs[1:])), 4) if reruns else None}
+    for label, group in [('first_run', spans[spans['run'] == first_run]), ('reruns', spans[spans['run'] != first_run])]:
+        stages = group.groupby('span')['ms']
+        report[f'{label}_spans'] = {
+            span: {'samples': int(len(values)), 'p50_ms': round(float(values.median()), 3),
+                   'p95_ms': round(float(values.quantile(0.95)), 3)}
+            for span, values in stages
+        }
+    return report
+
+# ============================================
+# Report
+# ============================================
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def flatten(report, prefix=''):
+    """{'a': {'b': 1}} -> {'a.b': 1}, keeping only numbers."""
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f'{prefix}{key}'] = value
+    return flat
+
+def compare(report, baseline):
+    """Print every timing that changed by more than 10% against ``baseline``."""
+    for result in report['results']:
+        previous = next((r for r in baseline['results'] if r['rows'] == result['rows']), None)
+        if previous is None:
+            continue
+        old, new = flatten(previous), flatten(result)
+        print(f"\n{result['rows']:,} rows vs {baseline['meta'].get('commit')}:")
+        for key in sorted(set(old) & set(new)):
+            if not key.endswith(('_s', '_ms')) or not old[key]:
+                continue
+            ratio = new[key] / old[key]
+            if abs(ratio - 1) > 0.1:
+                print(f"  {key:<60} {old[key]:>10.3f} -> {new[key]:>10.3f}  ({ratio:.2f}x)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', nargs='+', default=['100k', '1m'],
+                        help="dataset sizes, e.g. 100k 1m 10m 50m (default: 100k 1m)")
+    parser.add_argument('--data-dir', default=os.path.join(data_loader.SNAPSHOT_DIR, 'benchmark'),
+                        help="where generated CSVs and their snapshots are kept")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-filter-sets', type=int, default=300,
+                        help="filter sets to query per size; 0 runs every combination")
+    parser.add_argument('--distinct-mode', choices=['exact', 'sketch'], default='exact')
+    parser.add_argument('--streaming', action='store_true', help="benchmark the streaming ingest path")
+    parser.add_argument('--reruns', type=int, default=5, help="warm dashboard reruns after the first")
+    parser.add_argument('--skip-app', action='store_true', help="skip the end-to-end AppTest runs")
+    parser.add_argument('--output', default='benchmark_report.json')
+    parser.add_argument('--compare', help="an earlier report to compare against")
+    args = parser.parse_args(argv)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+        'results': [],
+    }
+    snapshot_dir = os.path.join(args.data_dir, data_loader.SNAPSHOT_DIR)
+    for rows in map(parse_rows, args.rows):
+        path = dataset_path(args.data_dir, rows, args.seed)
+        print(f"Benchmarking {rows:,} rows", file=sys.stderr)
+        state, load = bench_load(path, snapshot_dir, args.streaming)
+        distinct_mode = 'sketch' if args.streaming else args.distinct_mode
+        backend = query_backend.PandasBackend(state, distinct_mode, [path])
+        sets = filter_sets(backend.filter_options(), args.max_filter_sets, args.seed)
+        result = {
+            'rows': rows,
+            'csv_mb': round(os.path.getsize(path) / 2**20, 1),
+            'load': load,
+            'filter_sets': len(sets),
+            'queries': bench_queries(backend, sets),
+        }
+        if not args.skip_app:
+            env = {'DISTINCT_COUNT_MODE': args.distinct_mode,
+                   'INGEST_MODE': 'streaming' if args.streaming else 'memory'}
+            result['app'] = bench_app(path, args.data_dir, args.reruns, env)
+        report['results'].append(result)
+        print(json.dumps({'rows': rows, 'load': load, 'app_first_run_s': result.get('app', {}).get('first_run_s')}),
+              file=sys.stderr)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+if __name__ == '__main__':
+    main()
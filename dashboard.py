@@ -2,8 +2,18 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+import os
 import numpy as np
 
+import data_loader
+import forecasting
+import query_backend
+from analytics import GRANULARITIES, Analytics, month_label
+from formatting import fill_cards, format_currency, format_number
+from instrumentation import SpanRecorder
+from query_cache import QueryCache, result_fingerprint
+
 # ============================================
 # Page Configuration
 # ============================================
@@ -174,6 +184,11 @@ st.markdown(f"""
         margin-top: 4px;
     }}
     
+    .card-grid {{
+        display: grid;
+        gap: 1rem;
+    }}
+    
     /* Section headers */
     .section-title {{
         font-size: 1.25rem;
@@ -336,20 +351,100 @@ st.markdown(f"""
 </style>
 """, unsafe_allow_html=True)
 
+# ============================================
+# Instrumentation
+# ============================================
+# Timing spans around loading, filters, each tab, query, figure build and chart
+# send. Add ?admin=1 to the URL for the p50/p95 panel; set TIMING_EXPORT_PATH to
+# also write the spans as JSON lines or a Prometheus text file.
+TIMING_WINDOW = int(os.environ.get('TIMING_WINDOW', 200))
+TIMING_EXPORT_PATH = os.environ.get('TIMING_EXPORT_PATH') or None
+TIMING_EXPORT_FORMAT = os.environ.get('TIMING_EXPORT_FORMAT', 'jsonl')
+
+@st.cache_resource
+def get_span_recorder():
+    return SpanRecorder(TIMING_WINDOW, TIMING_EXPORT_PATH, TIMING_EXPORT_FORMAT)
+
+timings = get_span_recorder()
+timings.begin_run()
+
 # ============================================
 # Data Loading
 # ============================================
-@st.cache_data
-def load_data():
-    df = pd.read_csv('Sales Data.csv')
-    df['Order Date'] = pd.to_datetime(df['Order Date'])
-    df['Sales'] = df['Quantity Ordered'] * df['Price Each']
-    df['Month_Name'] = df['Order Date'].dt.month_name()
-    df['Day_of_Week'] = df['Order Date'].dt.day_name()
-    df['Week'] = df['Order Date'].dt.isocalendar().week
-    return df
+# A single CSV, a glob such as 'data/Sales_*_2019.csv', or a directory of CSVs
+DATA_SOURCE = os.environ.get('SALES_DATA_SOURCE', 'Sales Data.csv')
+# 'exact' counts distinct Order IDs over the filtered rows; 'sketch' merges the
+# per-cell HyperLogLog sketches instead (about 1.6% standard error, see data_loader)
+DISTINCT_COUNT_MODE = os.environ.get('DISTINCT_COUNT_MODE', 'exact')
+# 'memory' keeps the transaction rows; 'streaming' reads the CSV CHUNK_ROWS rows at a
+# time and keeps only the summaries; 'auto' streams sources over STREAMING_THRESHOLD_MB
+INGEST_MODE = os.environ.get('INGEST_MODE', 'auto')
+STREAMING_THRESHOLD_MB = int(os.environ.get('STREAMING_THRESHOLD_MB', 2048))
+CHUNK_ROWS = int(os.environ.get('CHUNK_ROWS', data_loader.CHUNK_ROWS))
+# 'pandas' answers every query from the in-memory store below; 'sqlite' or 'duckdb'
+# push the filters and aggregates down to SALES_DATABASE, rebuilt from DATA_SOURCE
+# whenever it changes, so workers share the rows through the OS page cache
+QUERY_BACKEND = os.environ.get('QUERY_BACKEND', 'pandas')
+SALES_DATABASE = os.environ.get('SALES_DATABASE', os.path.join(data_loader.SNAPSHOT_DIR, f'sales.{QUERY_BACKEND}'))
+# In memory mode the rows and filter index are a read-only memory-mapped Arrow file
+# published once per data version, so every session and every worker process on the
+# host reads one physical copy; '0' keeps a private copy per process instead
+SHARED_FRAME = os.environ.get('SHARED_FRAME', '1') != '0'
+# Seconds between background checks of the source for new data; 0 checks on every
+# rerun instead, which makes the session that notices a change wait for the reload
+REFRESH_INTERVAL_S = float(os.environ.get('REFRESH_INTERVAL_S', 10))
+
+# One store per process, shared by every session. Its background refresher only
+# stats the source files while nothing changed; when a file has grown, just the
+# appended rows are parsed and folded into the rows, filter index and summaries,
+# and the new state is swapped in for the next reruns. Only the very first load
+# happens on a rerun. Cold processes map the shared frame (or the columnar
+# snapshots) instead of re-parsing the CSVs. Sessions only take filtered subsets.
+def start_refresher(target):
+    if REFRESH_INTERVAL_S > 0:
+        data_loader.BackgroundRefresher(target, REFRESH_INTERVAL_S).start()
+    return target
 
-df = load_data()
+@st.cache_resource(show_spinner=False)
+def get_sales_store(source, streaming, with_sketches, shared):
+    return start_refresher(data_loader.SalesStore(source, streaming=streaming, with_sketches=with_sketches,
+                                                  chunk_rows=CHUNK_ROWS, shared=shared))
+
+@st.cache_resource(show_spinner=False)
+def get_sql_store(engine, database, source):
+    return start_refresher(query_backend.SQLStore(database, engine, source=source, chunk_rows=CHUNK_ROWS))
+
+with timings.span('load_data'):
+    if QUERY_BACKEND == 'pandas':
+        data_paths = data_loader.resolve_sources(DATA_SOURCE)
+        streaming = INGEST_MODE == 'streaming' or (
+            INGEST_MODE == 'auto' and sum(map(os.path.getsize, data_paths)) > STREAMING_THRESHOLD_MB * 2**20)
+        if streaming:
+            # No rows are held in memory, so distinct counts can only come from the sketches
+            DISTINCT_COUNT_MODE = 'sketch'
+
+        store = get_sales_store(DATA_SOURCE, streaming, DISTINCT_COUNT_MODE == 'sketch', SHARED_FRAME)
+        if streaming and store.state is None:
+            progress_bar = st.progress(0.0, text="Loading sales data...")
+            data = store.refresh(progress=lambda done: progress_bar.progress(done, text=f"Loading sales data... {done:.0%}"))
+            progress_bar.empty()
+        elif store.state is None or REFRESH_INTERVAL_S <= 0:
+            data = store.refresh()
+        else:
+            # This rerun keeps the state current now, even if the refresher swaps in another
+            data = store.state
+        # Charts and KPIs are answered from the pre-aggregated summaries (cube, order
+        # sketches), indexed the same way as the rows so a filter slices them without a scan
+        backend = query_backend.PandasBackend(data, DISTINCT_COUNT_MODE, data_paths, CHUNK_ROWS)
+    else:
+        store = get_sql_store(QUERY_BACKEND, SALES_DATABASE, DATA_SOURCE or None)
+        if store.state is None or REFRESH_INTERVAL_S <= 0:
+            with st.spinner("Loading sales database..."):
+                data = store.refresh()
+        else:
+            data = store.state
+        # Bound to this state's database file, which a refresh never replaces in place
+        backend = query_backend.SQLBackend(data, DISTINCT_COUNT_MODE, store.connections)
 
 # ============================================
 # Chart Theme based on mode
@@ -382,105 +477,131 @@ st.markdown("---")
 # ============================================
 # Navigation Tabs at TOP
 # ============================================
-tab1, tab2, tab3, tab4 = st.tabs(["Executive Pulse", "Revenue & Marketing", "Regional Insights", "Data Explorer"])
+# With LAZY_TABS the tabs track which one is selected and only that tab's
+# aggregations and figures run; switching tabs triggers a rerun. Widgets in hidden
+# tabs keep their values (persist_state) and their aggregates stay in the query cache.
+LAZY_TABS = os.environ.get('LAZY_TABS', '1') != '0'
+TAB_OPTIONS = dict(key='main_tab', on_change='rerun') if LAZY_TABS else {}
+
+tab1, tab2, tab3, tab4 = st.tabs(["Executive Pulse", "Revenue & Marketing", "Regional Insights", "Data Explorer"], **TAB_OPTIONS)
+
+def tab_is_active(tab):
+    # .open is None when tabs don't track state; then every tab renders
+    return tab.open is not False
 
 # ============================================
 # Filters Row at TOP (inside each tab)
 # ============================================
+@timings.timed('render_filters')
 def render_filters():
+    filter_options = analytics.filter_options()
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        cities = ['All Cities'] + sorted(df['City'].unique().tolist())
-        selected_city = st.selectbox("City", cities, key=f"city_{st.session_state.get('tab', 0)}")
+        cities = ['All Cities'] + filter_options['City']
+        selected_city = st.selectbox("City", cities, key=f"city_{st.session_state.get('tab', 0)}", persist_state='page')
     with col2:
-        months = ['All Months'] + [f"Month {i}" for i in sorted(df['Month'].unique().tolist())]
-        selected_month = st.selectbox("Month", months, key=f"month_{st.session_state.get('tab', 0)}")
+        months = ['All Months'] + [f"Month {i}" for i in filter_options['Month']]
+        selected_month = st.selectbox("Month", months, key=f"month_{st.session_state.get('tab', 0)}", persist_state='page')
     with col3:
-        products = ['All Products'] + sorted(df['Product'].unique().tolist())
-        selected_product = st.selectbox("Product", products, key=f"product_{st.session_state.get('tab', 0)}")
+        products = ['All Products'] + filter_options['Product']
+        selected_product = st.selectbox("Product", products, key=f"product_{st.session_state.get('tab', 0)}", persist_state='page')
     with col4:
         st.markdown("<br>", unsafe_allow_html=True)
         st.button("Apply Filters", key=f"apply_{st.session_state.get('tab', 0)}")
     
-    # Apply filters
-    filtered = df.copy()
+    filters = {}
     if selected_city != 'All Cities':
-        filtered = filtered[filtered['City'] == selected_city]
+        filters['City'] = selected_city
     if selected_month != 'All Months':
-        month_num = int(selected_month.split()[-1])
-        filtered = filtered[filtered['Month'] == month_num]
+        filters['Month'] = int(selected_month.split()[-1])
     if selected_product != 'All Products':
-        filtered = filtered[filtered['Product'] == selected_product]
-    
-    return filtered
+        filters['Product'] = selected_product
+    return filters
 
-# Helper functions
-def format_currency(value):
-    if value >= 1e6:
-        return f"${value/1e6:.2f}M"
-    elif value >= 1e3:
-        return f"${value/1e3:.1f}K"
-    return f"${value:.2f}"
+# ============================================
+# Shared Query Layer
+# ============================================
+# Every aggregate the tabs draw comes from the analytics layer (analytics.py) over
+# the configured backend. Its results are memoised per (backend, data version,
+# call, filters) in one process-wide LRU capped at QUERY_CACHE_MAX_MB, so tabs
+# asking for the same aggregate, later reruns and other sessions share a single
+# computation. Cached results are shared: never mutate them.
+QUERY_CACHE_MAX_MB = int(os.environ.get('QUERY_CACHE_MAX_MB', 64))
+
+@st.cache_resource
+def get_query_cache():
+    return QueryCache(QUERY_CACHE_MAX_MB * 2**20)
 
-def format_number(value):
-    if value >= 1e6:
-        return f"{value/1e6:.2f}M"
-    elif value >= 1e3:
-        return f"{value/1e3:.1f}K"
-    return f"{value:,.0f}"
+query_cache = get_query_cache()
+analytics = Analytics(backend, cache=query_cache, timings=timings, namespace=QUERY_BACKEND)
+
+# ============================================
+# Figure Cache
+# ============================================
+# Built figures are kept per (chart id, fingerprint of the data drawn), so a chart
+# whose data has not changed is re-sent without rebuilding the figure and layout.
+# Entries are sized by their serialized spec and capped at FIGURE_CACHE_MAX_MB.
+# Cached figures are shared between sessions: never mutate them.
+FIGURE_CACHE_MAX_MB = int(os.environ.get('FIGURE_CACHE_MAX_MB', 32))
+
+def figure_nbytes(fig):
+    return len(pio.to_json(fig, validate=False))
+
+@st.cache_resource
+def get_figure_cache():
+    return QueryCache(FIGURE_CACHE_MAX_MB * 2**20, sizeof=figure_nbytes)
+
+figure_cache = get_figure_cache()
+
+def cached_figure(chart_id, build, *data):
+    return figure_cache.get_or_compute((chart_id, result_fingerprint(*data)), timings.timed(f'figure.{chart_id}')(build))
+
+def plot_chart(chart_id, build, *data):
+    figure = cached_figure(chart_id, build, *data)
+    # Streamlit serializes the figure to JSON here
+    with timings.span(f'chart.{chart_id}'):
+        st.plotly_chart(figure, use_container_width=True)
+
+# ============================================
+# Card Rows
+# ============================================
+# A set of N cards is one st.markdown call. Callers pass whole columns of values
+# (strings or numbers; scalars apply to every card) and formatting.fill_cards
+# fills each template field for all cards at once, so there is no per-card
+# Python formatting or Streamlit element.
+KPI_CARD = ('<div class="kpi-simple"><div class="kpi-simple-label">{label}</div>'
+            '<div class="kpi-simple-value">{value}</div><div class="kpi-simple-delta">{delta}</div></div>')
+CITY_CARD = ('<div class="city-card"><div style="display: flex; justify-content: space-between; align-items: center;">'
+             '<span class="city-name">{city}</span><span class="city-revenue">{revenue}</span></div>'
+             '<div style="background: {track}; border-radius: 4px; height: 4px; margin-top: 8px;">'
+             '<div style="background: {bar}; width: {share}%; height: 100%; border-radius: 4px;"></div></div>'
+             '<div class="city-percent">{share_label}% of total</div></div>')
+# Cards in the Top Cities Overview
+TOP_CITY_CARDS = int(os.environ.get('TOP_CITY_CARDS', 5))
+
+def render_cards(template, columns=None, **fields):
+    """One markdown block of cards, laid out in ``columns`` grid columns or stacked."""
+    layout = f' class="card-grid" style="grid-template-columns: repeat({columns}, 1fr);"' if columns else ''
+    st.markdown(f'<div{layout}>{fill_cards(template, **fields)}</div>', unsafe_allow_html=True)
 
 # ============================================
 # TAB 1: Executive Pulse
 # ============================================
-with tab1:
+@timings.timed('tab.executive_pulse')
+def render_executive_pulse():
     st.session_state['tab'] = 1
-    filtered_df = render_filters()
+    filters = render_filters()
     
     st.markdown("---")
     
     # KPI Row
-    col1, col2, col3, col4 = st.columns(4)
-    
-    total_revenue = filtered_df['Sales'].sum()
-    total_units = filtered_df['Quantity Ordered'].sum()
-    aov = total_revenue / max(filtered_df['Order ID'].nunique(), 1)
-    unique_orders = filtered_df['Order ID'].nunique()
-    
-    with col1:
-        st.markdown(f"""
-        <div class="kpi-simple">
-            <div class="kpi-simple-label">Total Revenue</div>
-            <div class="kpi-simple-value">{format_currency(total_revenue)}</div>
-            <div class="kpi-simple-delta">+12.4% vs Target</div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f"""
-        <div class="kpi-simple">
-            <div class="kpi-simple-label">Average Order Value</div>
-            <div class="kpi-simple-value">${aov:.2f}</div>
-            <div class="kpi-simple-delta">+8.2% vs Last Period</div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown(f"""
-        <div class="kpi-simple">
-            <div class="kpi-simple-label">Units Sold</div>
-            <div class="kpi-simple-value">{format_number(total_units)}</div>
-            <div class="kpi-simple-delta">+15.7% Growth</div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col4:
-        st.markdown(f"""
-        <div class="kpi-simple">
-            <div class="kpi-simple-label">Unique Orders</div>
-            <div class="kpi-simple-value">{format_number(unique_orders)}</div>
-            <div class="kpi-simple-delta">Customer Velocity</div>
-        </div>
-        """, unsafe_allow_html=True)
+    kpis = analytics.kpis(filters)
+    render_cards(
+        KPI_CARD, columns=4,
+        label=['Total Revenue', 'Average Order Value', 'Units Sold', 'Unique Orders'],
+        value=[format_currency(kpis['revenue']), f"${kpis['aov']:.2f}", format_number(kpis['units']), format_number(kpis['orders'])],
+        delta=['+12.4% vs Target', '+8.2% vs Last Period', '+15.7% Growth', 'Customer Velocity'],
+    )
     
     st.markdown("<br>", unsafe_allow_html=True)
     
@@ -488,59 +609,66 @@ with tab1:
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        st.markdown('<div class="section-title">Monthly Performance</div>', unsafe_allow_html=True)
+        performance_granularity = st.session_state.get('performance_granularity', 'month')
+        st.markdown(f'<div class="section-title">{GRANULARITIES[performance_granularity]} Performance</div>', unsafe_allow_html=True)
+        st.radio("Granularity", list(GRANULARITIES), format_func=GRANULARITIES.get, index=2, horizontal=True,
+                 label_visibility='collapsed', key='performance_granularity', persist_state='page')
         
-        monthly_sales = filtered_df.groupby('Month')['Sales'].sum().reset_index()
-        month_names = {1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr', 5: 'May', 6: 'Jun',
-                       7: 'Jul', 8: 'Aug', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'}
-        monthly_sales['Month_Label'] = monthly_sales['Month'].map(month_names)
+        sales_over_time = analytics.sales_over_time(filters, performance_granularity)
         
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=monthly_sales['Month_Label'],
-            y=monthly_sales['Sales'],
-            mode='lines+markers',
-            line=dict(color='#0066FF', width=2),
-            marker=dict(size=8, color='#0066FF'),
-            fill='tozeroy',
-            fillcolor='rgba(0, 102, 255, 0.1)',
-            hovertemplate='%{x}<br>Sales: $%{y:,.0f}<extra></extra>'
-        ))
+        def monthly_performance_figure():
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(
+                x=sales_over_time['Label'],
+                y=sales_over_time['Sales'],
+                mode='lines' if performance_granularity == 'day' else 'lines+markers',
+                line=dict(color='#0066FF', width=2),
+                marker=dict(size=8, color='#0066FF'),
+                fill='tozeroy',
+                fillcolor='rgba(0, 102, 255, 0.1)',
+                hovertemplate='%{x}<br>Sales: $%{y:,.0f}<extra></extra>'
+            ))
+            
+            fig.update_layout(
+                **CHART_LAYOUT,
+                height=350,
+                xaxis=dict(showgrid=False, title=dict(text='', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT),
+                yaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', title=dict(text='', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT)
+            )
+            return fig
         
-        fig.update_layout(
-            **CHART_LAYOUT,
-            height=350,
-            xaxis=dict(showgrid=False, title=dict(text='', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT),
-            yaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', title=dict(text='', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        plot_chart('monthly_performance', monthly_performance_figure, sales_over_time, performance_granularity)
     
     with col2:
         st.markdown('<div class="section-title">City Leaderboard</div>', unsafe_allow_html=True)
         
-        city_sales = filtered_df.groupby('City')['Sales'].sum().sort_values(ascending=True).tail(5).reset_index()
+        city_sales = analytics.city_leaderboard(filters, n=5)
         
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            x=city_sales['Sales'],
-            y=city_sales['City'].str.strip(),
-            orientation='h',
-            marker=dict(color='#0066FF'),
-            hovertemplate='%{y}<br>Revenue: $%{x:,.0f}<extra></extra>'
-        ))
+        def city_leaderboard_figure():
+            fig = go.Figure()
+            fig.add_trace(go.Bar(
+                x=city_sales['Sales'],
+                y=city_sales['City'].str.strip(),
+                orientation='h',
+                marker=dict(color='#0066FF'),
+                hovertemplate='%{y}<br>Revenue: $%{x:,.0f}<extra></extra>'
+            ))
+            
+            fig.update_layout(
+                **CHART_LAYOUT,
+                height=350,
+                xaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', tickfont=AXIS_TICKFONT, title=dict(font=AXIS_TICKFONT)),
+                yaxis=dict(showgrid=False, tickfont=AXIS_TICKFONT, title=dict(font=AXIS_TICKFONT))
+            )
+            return fig
         
-        fig.update_layout(
-            **CHART_LAYOUT,
-            height=350,
-            xaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', tickfont=AXIS_TICKFONT, title=dict(font=AXIS_TICKFONT)),
-            yaxis=dict(showgrid=False, tickfont=AXIS_TICKFONT, title=dict(font=AXIS_TICKFONT))
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        plot_chart('city_leaderboard', city_leaderboard_figure, city_sales)
     
     # Executive Summary
-    top_city = filtered_df.groupby('City')['Sales'].sum().idxmax()
-    top_product = filtered_df.groupby('Product')['Quantity Ordered'].sum().idxmax()
-    peak_month = month_names.get(filtered_df.groupby('Month')['Sales'].sum().idxmax(), 'N/A')
+    highlights = analytics.highlights(filters)
+    top_city = highlights['top_city']
+    top_product = highlights['top_product']
+    peak_month = highlights['peak_month']
     
     st.markdown(f"""
     <div class="summary-box">
@@ -549,7 +677,7 @@ with tab1:
             <li><strong>Top Performing City:</strong> {top_city.strip()} leads in revenue generation</li>
             <li><strong>Best Selling Product:</strong> {top_product} drives the highest unit sales</li>
             <li><strong>Peak Revenue Month:</strong> {peak_month}</li>
-            <li><strong>Average Order Value:</strong> ${aov:.2f} indicates healthy basket sizes</li>
+            <li><strong>Average Order Value:</strong> ${kpis['aov']:.2f} indicates healthy basket sizes</li>
         </ul>
     </div>
     """, unsafe_allow_html=True)
@@ -557,21 +685,22 @@ with tab1:
 # ============================================
 # TAB 2: Revenue & Marketing
 # ============================================
-with tab2:
+@timings.timed('tab.revenue_marketing')
+def render_revenue_marketing():
     st.session_state['tab'] = 2
-    filtered_df = render_filters()
+    filters = render_filters()
     
     st.markdown("---")
     
     # Growth Simulation
     col1, col2, col3 = st.columns([2, 1, 1])
     with col1:
-        growth_rate = st.slider("Simulate Growth Rate (%)", min_value=-20, max_value=50, value=0, step=5)
+        growth_rate = st.slider("Simulate Growth Rate (%)", min_value=-20, max_value=50, value=0, step=5, key="growth_rate", persist_state='page')
     
-    projected_revenue = filtered_df['Sales'].sum() * (1 + growth_rate/100)
+    current_revenue, projected_revenue = analytics.growth_projection(filters, growth_rate)
     
     with col2:
-        st.metric("Current Revenue", format_currency(filtered_df['Sales'].sum()))
+        st.metric("Current Revenue", format_currency(current_revenue))
     with col3:
         st.metric("Projected Revenue", format_currency(projected_revenue), delta=f"{growth_rate:+}%")
     
@@ -584,49 +713,55 @@ with tab2:
         st.markdown('<div class="section-title">Sales by Hour of Day</div>', unsafe_allow_html=True)
         st.markdown('<div class="section-description">Identify peak hours for advertising campaigns</div>', unsafe_allow_html=True)
         
-        hourly_sales = filtered_df.groupby('Hour')['Sales'].sum().reset_index()
+        hourly_sales = analytics.hourly_sales(filters)
         
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            x=hourly_sales['Hour'],
-            y=hourly_sales['Sales'],
-            marker=dict(color='#0066FF'),
-            hovertemplate='Hour: %{x}:00<br>Sales: $%{y:,.0f}<extra></extra>'
-        ))
+        def hourly_sales_figure():
+            fig = go.Figure()
+            fig.add_trace(go.Bar(
+                x=hourly_sales['Hour'],
+                y=hourly_sales['Sales'],
+                marker=dict(color='#0066FF'),
+                hovertemplate='Hour: %{x}:00<br>Sales: $%{y:,.0f}<extra></extra>'
+            ))
+            
+            fig.update_layout(
+                **CHART_LAYOUT,
+                height=300,
+                xaxis=dict(showgrid=False, title=dict(text='Hour of Day', font=AXIS_TICKFONT), tickmode='array', tickvals=list(range(0, 24, 3)), tickfont=AXIS_TICKFONT),
+                yaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', title=dict(text='', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT)
+            )
+            return fig
         
-        fig.update_layout(
-            **CHART_LAYOUT,
-            height=300,
-            xaxis=dict(showgrid=False, title=dict(text='Hour of Day', font=AXIS_TICKFONT), tickmode='array', tickvals=list(range(0, 24, 3)), tickfont=AXIS_TICKFONT),
-            yaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', title=dict(text='', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        plot_chart('hourly_sales', hourly_sales_figure, hourly_sales)
     
     with col2:
         st.markdown('<div class="section-title">Top 10 Products by Revenue</div>', unsafe_allow_html=True)
         st.markdown('<div class="section-description">Focus inventory and marketing on top performers</div>', unsafe_allow_html=True)
         
-        top_products = filtered_df.groupby('Product')['Sales'].sum().sort_values(ascending=True).tail(10).reset_index()
+        top_products = analytics.top_products(filters, n=10)
         
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            x=top_products['Sales'],
-            y=top_products['Product'],
-            orientation='h',
-            marker=dict(color='#0066FF'),
-            hovertemplate='%{y}<br>Revenue: $%{x:,.0f}<extra></extra>'
-        ))
+        def top_products_figure():
+            fig = go.Figure()
+            fig.add_trace(go.Bar(
+                x=top_products['Sales'],
+                y=top_products['Product'],
+                orientation='h',
+                marker=dict(color='#0066FF'),
+                hovertemplate='%{y}<br>Revenue: $%{x:,.0f}<extra></extra>'
+            ))
+            
+            fig.update_layout(
+                **CHART_LAYOUT,
+                height=300,
+                xaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', tickfont=AXIS_TICKFONT, title=dict(font=AXIS_TICKFONT)),
+                yaxis=dict(showgrid=False, tickfont=AXIS_TICKFONT, title=dict(font=AXIS_TICKFONT))
+            )
+            return fig
         
-        fig.update_layout(
-            **CHART_LAYOUT,
-            height=300,
-            xaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', tickfont=AXIS_TICKFONT, title=dict(font=AXIS_TICKFONT)),
-            yaxis=dict(showgrid=False, tickfont=AXIS_TICKFONT, title=dict(font=AXIS_TICKFONT))
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        plot_chart('top_products', top_products_figure, top_products)
     
     # Recommendations
-    peak_hour = hourly_sales.loc[hourly_sales['Sales'].idxmax(), 'Hour']
+    peak_hour = analytics.highlights(filters)['peak_hour']
     st.markdown(f"""
     <div class="summary-box">
         <h3>Marketing Recommendations</h3>
@@ -641,9 +776,10 @@ with tab2:
 # ============================================
 # TAB 3: Regional Insights
 # ============================================
-with tab3:
+@timings.timed('tab.regional_insights')
+def render_regional_insights():
     st.session_state['tab'] = 3
-    filtered_df = render_filters()
+    filters = render_filters()
     
     st.markdown("---")
     
@@ -651,84 +787,80 @@ with tab3:
     st.markdown('<div class="section-description">Geospatial analysis for warehouse placement and retail hub optimization</div>', unsafe_allow_html=True)
     
     # City Performance
-    city_performance = filtered_df.groupby('City').agg({
-        'Sales': 'sum',
-        'Quantity Ordered': 'sum',
-        'Order ID': 'nunique'
-    }).reset_index()
-    city_performance.columns = ['City', 'Revenue', 'Units', 'Orders']
-    city_performance = city_performance.sort_values('Revenue', ascending=False)
+    city_performance = analytics.city_performance(filters)
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        city_sorted = city_performance.sort_values('Revenue', ascending=True)
+        city_sorted = city_performance['ascending']
         
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            x=city_sorted['Revenue'],
-            y=city_sorted['City'].str.strip(),
-            orientation='h',
-            marker=dict(color='#0066FF'),
-            text=[f"${v:,.0f}" for v in city_sorted['Revenue']],
-            textposition='inside',
-            textfont=dict(color='white', size=11),
-            hovertemplate='%{y}<br>Revenue: $%{x:,.0f}<extra></extra>'
-        ))
+        def regional_revenue_figure():
+            fig = go.Figure()
+            fig.add_trace(go.Bar(
+                x=city_sorted['Revenue'],
+                y=city_sorted['City'].str.strip(),
+                orientation='h',
+                marker=dict(color='#0066FF'),
+                texttemplate='$%{x:,.0f}',
+                textposition='inside',
+                textfont=dict(color='white', size=11),
+                hovertemplate='%{y}<br>Revenue: $%{x:,.0f}<extra></extra>'
+            ))
+            
+            fig.update_layout(
+                **CHART_LAYOUT,
+                height=400,
+                xaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', title=dict(text='Revenue', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT),
+                yaxis=dict(showgrid=False, title=dict(text='', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT)
+            )
+            return fig
         
-        fig.update_layout(
-            **CHART_LAYOUT,
-            height=400,
-            xaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', title=dict(text='Revenue', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT),
-            yaxis=dict(showgrid=False, title=dict(text='', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        plot_chart('regional_revenue', regional_revenue_figure, city_sorted)
     
     with col2:
         st.markdown("#### Top Cities Overview")
-        for idx, row in city_performance.head(5).iterrows():
-            pct = row['Revenue'] / city_performance['Revenue'].sum() * 100
-            st.markdown(f"""
-            <div class="city-card">
-                <div style="display: flex; justify-content: space-between; align-items: center;">
-                    <span class="city-name">{row['City'].strip()}</span>
-                    <span class="city-revenue">{format_currency(row['Revenue'])}</span>
-                </div>
-                <div style="background: {theme['border']}; border-radius: 4px; height: 4px; margin-top: 8px;">
-                    <div style="background: {theme['accent']}; width: {pct}%; height: 100%; border-radius: 4px;"></div>
-                </div>
-                <div class="city-percent">{pct:.1f}% of total</div>
-            </div>
-            """, unsafe_allow_html=True)
+        top_cities = city_performance['descending'].head(TOP_CITY_CARDS)
+        share = top_cities['Share'].to_numpy()
+        render_cards(
+            CITY_CARD,
+            city=top_cities['City'].str.strip(),
+            revenue=format_currency(top_cities['Revenue'].to_numpy()),
+            share=share,
+            share_label=np.strings.mod('%.1f', share),
+            track=theme['border'],
+            bar=theme['accent'],
+        )
     
     # Heatmap
     st.markdown('<div class="section-title">Order Volume Heatmap</div>', unsafe_allow_html=True)
     
-    heatmap_data = filtered_df.groupby(['Day_of_Week', 'Hour'])['Sales'].sum().unstack(fill_value=0)
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    heatmap_data = heatmap_data.reindex(day_order)
+    heatmap_data = analytics.heatmap(filters)
     
     heatmap_colors = [[0, '#FFFFFF'], [0.5, '#66B3FF'], [1, '#0066FF']]
     
-    fig = go.Figure(data=go.Heatmap(
-        z=heatmap_data.values,
-        x=heatmap_data.columns,
-        y=heatmap_data.index,
-        colorscale=heatmap_colors,
-        hovertemplate='Day: %{y}<br>Hour: %{x}:00<br>Sales: $%{z:,.0f}<extra></extra>'
-    ))
-    
-    fig.update_layout(
-        **CHART_LAYOUT,
-        height=300,
-        xaxis=dict(title=dict(text='Hour of Day', font=AXIS_TICKFONT), tickmode='array', tickvals=list(range(0, 24, 4)), tickfont=AXIS_TICKFONT),
-        yaxis=dict(title=dict(text='', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT)
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    def order_heatmap_figure():
+        fig = go.Figure(data=go.Heatmap(
+            z=heatmap_data.values,
+            x=heatmap_data.columns,
+            y=heatmap_data.index,
+            colorscale=heatmap_colors,
+            hovertemplate='Day: %{y}<br>Hour: %{x}:00<br>Sales: $%{z:,.0f}<extra></extra>'
+        ))
+        
+        fig.update_layout(
+            **CHART_LAYOUT,
+            height=300,
+            xaxis=dict(title=dict(text='Hour of Day', font=AXIS_TICKFONT), tickmode='array', tickvals=list(range(0, 24, 4)), tickfont=AXIS_TICKFONT),
+            yaxis=dict(title=dict(text='', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT)
+        )
+        return fig
+    
+    plot_chart('order_heatmap', order_heatmap_figure, heatmap_data)
     
     # Logistics Recommendation
-    peak_day = filtered_df.groupby('Day_of_Week')['Sales'].sum().idxmax()
-    peak_hour = filtered_df.groupby('Hour')['Sales'].sum().idxmax()
+    highlights = analytics.highlights(filters)
+    peak_day = highlights['peak_day']
+    peak_hour = highlights['peak_hour']
     
     st.markdown(f"""
     <div class="summary-box">
@@ -742,132 +874,236 @@ with tab3:
     </div>
     """, unsafe_allow_html=True)
 
+# ============================================
+# Live Worksheet
+# ============================================
+# A fragment: its widgets rerun only the worksheet, not the tabs and charts around
+# it. The search commits after a SEARCH_DEBOUNCE typing pause, and each search
+# narrows the rows cached for the one before it (see PandasBackend.search_rows).
+SEARCH_DEBOUNCE = os.environ.get('SEARCH_DEBOUNCE', '300ms')
+
+@st.fragment
+@timings.timed('worksheet')
+def render_worksheet(filters):
+    st.markdown('<div class="section-title">Live Data Worksheet</div>', unsafe_allow_html=True)
+    
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        search_term = st.text_input("Search Products", placeholder="Type to filter products...", key="worksheet_search", persist_state='page', live=SEARCH_DEBOUNCE)
+    with col2:
+        quantity_threshold = st.number_input("Min Quantity Filter", min_value=1, value=1, key="worksheet_min_quantity", persist_state='page')
+    with col3:
+        sort_column = st.selectbox("Sort By", ['Original Order'] + query_backend.WORKSHEET_COLUMNS, key="worksheet_sort", persist_state='page')
+    with col4:
+        sort_order = st.selectbox("Order", ['Ascending', 'Descending'], key="worksheet_order", persist_state='page')
+    
+    # Back to the first page whenever the query behind the pages changes
+    worksheet_query = (tuple(sorted(filters.items())), search_term, quantity_threshold, sort_column, sort_order)
+    if st.session_state.get('worksheet_query') != worksheet_query:
+        st.session_state['worksheet_query'] = worksheet_query
+        st.session_state['worksheet_page'] = 0
+    page = st.session_state['worksheet_page']
+    
+    display_df, has_next = analytics.worksheet(
+        filters, search_term, quantity_threshold, page=page,
+        sort=None if sort_column == 'Original Order' else sort_column,
+        ascending=sort_order == 'Ascending'
+    )
+    
+    st.dataframe(
+        display_df,
+        use_container_width=True,
+        height=400
+    )
+    
+    def turn_page(step):
+        st.session_state['worksheet_page'] = max(st.session_state['worksheet_page'] + step, 0)
+    
+    col1, col2, col3 = st.columns([1, 4, 1])
+    with col1:
+        st.button("Previous", key="worksheet_previous", disabled=page == 0, on_click=turn_page, args=(-1,))
+    with col2:
+        st.caption(f"Page {page + 1}")
+    with col3:
+        st.button("Next", key="worksheet_next", disabled=not has_next, on_click=turn_page, args=(1,))
+
 # ============================================
 # TAB 4: Data Explorer
 # ============================================
-with tab4:
+@timings.timed('tab.data_explorer')
+def render_data_explorer():
     st.session_state['tab'] = 4
-    filtered_df = render_filters()
+    filters = render_filters()
     
     st.markdown("---")
     
     # Metadata
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Total Records", f"{len(filtered_df):,}")
+        st.metric("Total Records", f"{analytics.kpis(filters)['order_lines']:,}")
     with col2:
-        st.metric("Date Range", f"{df['Order Date'].min().strftime('%Y-%m-%d')}")
+        st.metric("Date Range", f"{analytics.date_min().strftime('%Y-%m-%d')}")
+    data_version, updated_at = analytics.data_version()
+    updated_at = pd.Timestamp.fromtimestamp(updated_at).strftime('%Y-%m-%d %H:%M:%S')
     with col3:
-        st.metric("Last Updated", "2026-01-25")
+        st.metric("Last Updated", updated_at, help=f"Data version {data_version}")
     with col4:
         st.metric("Data Source", "CSV Import")
     
+    refresh = (f"new data is picked up in the background every {REFRESH_INTERVAL_S:g}s" if REFRESH_INTERVAL_S > 0
+               else "new data is picked up on the next rerun")
+    st.caption(f"Data version {data_version}, source last changed {updated_at}; {refresh}")
+    
     st.markdown("<br>", unsafe_allow_html=True)
     
     # Sub-tabs
-    subtab1, subtab2, subtab3 = st.tabs(["Live Worksheet", "Analytics", "Forecasting"])
+    subtab1, subtab2, subtab3 = st.tabs(["Live Worksheet", "Analytics", "Forecasting"], **dict(TAB_OPTIONS, key='explorer_tab'))
     
     with subtab1:
-        st.markdown('<div class="section-title">Live Data Worksheet</div>', unsafe_allow_html=True)
-        
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            search_term = st.text_input("Search Products", placeholder="Type to filter products...")
-        with col2:
-            quantity_threshold = st.number_input("Min Quantity Filter", min_value=1, value=1)
-        
-        display_df = filtered_df.copy()
-        if search_term:
-            display_df = display_df[display_df['Product'].str.contains(search_term, case=False)]
-        display_df = display_df[display_df['Quantity Ordered'] >= quantity_threshold]
-        
-        st.dataframe(
-            display_df[['Order ID', 'Product', 'Quantity Ordered', 'Price Each', 'Sales', 'City', 'Order Date']].head(100),
-            use_container_width=True,
-            height=400
-        )
+        if tab_is_active(subtab1):
+            render_worksheet(filters)
     
     with subtab2:
-        st.markdown('<div class="section-title">Product Analytics</div>', unsafe_allow_html=True)
+        if tab_is_active(subtab2):
+            st.markdown('<div class="section-title">Product Analytics</div>', unsafe_allow_html=True)
         
-        product_stats = filtered_df.groupby('Product').agg({
-            'Sales': 'sum',
-            'Quantity Ordered': 'sum',
-            'Order ID': 'nunique'
-        }).reset_index()
-        product_stats.columns = ['Product', 'Revenue', 'Units', 'Orders']
-        
-        fig = px.bar(
-            product_stats.sort_values('Revenue', ascending=True),
-            y='Product',
-            x='Revenue',
-            orientation='h',
-            color_discrete_sequence=['#0066FF']
-        )
+            product_stats = analytics.product_stats(filters)
         
-        fig.update_layout(
-            **CHART_LAYOUT,
-            height=500,
-            xaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', tickfont=AXIS_TICKFONT, title=dict(font=AXIS_TICKFONT)),
-            yaxis=dict(showgrid=False, tickfont=AXIS_TICKFONT, title=dict(font=AXIS_TICKFONT))
-        )
-        st.plotly_chart(fig, use_container_width=True)
+            def product_analytics_figure():
+                fig = px.bar(
+                    product_stats,
+                    y='Product',
+                    x='Revenue',
+                    orientation='h',
+                    color_discrete_sequence=['#0066FF']
+                )
+            
+                fig.update_layout(
+                    **CHART_LAYOUT,
+                    height=500,
+                    xaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', tickfont=AXIS_TICKFONT, title=dict(font=AXIS_TICKFONT)),
+                    yaxis=dict(showgrid=False, tickfont=AXIS_TICKFONT, title=dict(font=AXIS_TICKFONT))
+                )
+                return fig
+            
+            plot_chart('product_analytics', product_analytics_figure, product_stats)
     
     with subtab3:
-        st.markdown('<div class="section-title">Revenue Forecasting</div>', unsafe_allow_html=True)
-        
-        monthly_sales = filtered_df.groupby('Month')['Sales'].sum().reset_index()
+        if tab_is_active(subtab3):
+            st.markdown('<div class="section-title">Revenue Forecasting</div>', unsafe_allow_html=True)
         
-        if len(monthly_sales) >= 3:
-            coeffs = np.polyfit(monthly_sales['Month'], monthly_sales['Sales'], 1)
-            forecast_months = [13, 14, 15]
-            forecast_values = np.polyval(coeffs, forecast_months)
-        else:
-            forecast_months = []
-            forecast_values = []
-        
-        month_names = {1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr', 5: 'May', 6: 'Jun',
-                       7: 'Jul', 8: 'Aug', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec',
-                       13: 'Jan 26', 14: 'Feb 26', 15: 'Mar 26'}
+            model_col, granularity_col = st.columns(2)
+            with granularity_col:
+                forecast_granularity = st.radio(
+                    "Granularity", list(GRANULARITIES), format_func=GRANULARITIES.get, index=2, horizontal=True,
+                    key="forecast_granularity", persist_state='page'
+                )
+            with model_col:
+                forecast_model = st.selectbox(
+                    "Model", analytics.forecast_models(forecast_granularity), format_func=forecasting.MODELS.get,
+                    key="forecast_model", persist_state='page'
+                )
+            forecast = analytics.forecast(filters, forecast_model, forecast_granularity)
+            history = forecast['history']
+            forecast_values = forecast['values']
         
-        fig = go.Figure()
+            def revenue_forecast_figure():
+                fig = go.Figure()
+            
+                fig.add_trace(go.Scatter(
+                    x=history['Label'],
+                    y=history['Sales'],
+                    mode='lines' if forecast_granularity == 'day' else 'lines+markers',
+                    line=dict(color='#0066FF', width=2),
+                    marker=dict(size=8),
+                    name='Historical'
+                ))
+            
+                if len(forecast_values) > 0:
+                    fig.add_trace(go.Scatter(
+                        x=forecast['labels'],
+                        y=forecast_values,
+                        mode='lines' if forecast_granularity == 'day' else 'lines+markers',
+                        line=dict(color='#00AA55', width=2, dash='dot'),
+                        marker=dict(size=8, symbol='diamond'),
+                        name='Forecast'
+                    ))
+            
+                fig.update_layout(
+                    **CHART_LAYOUT,
+                    height=400,
+                    legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1, font=dict(color=theme['chart_text'])),
+                    xaxis=dict(showgrid=False, title=dict(text={'day': 'Day', 'week': 'ISO Week', 'month': 'Month'}[forecast_granularity], font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT),
+                    yaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', title=dict(text='Revenue', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT)
+                )
+                return fig
+            
+            plot_chart('revenue_forecast', revenue_forecast_figure, history, forecast_values, forecast_granularity)
         
-        fig.add_trace(go.Scatter(
-            x=[month_names[m] for m in monthly_sales['Month']],
-            y=monthly_sales['Sales'],
-            mode='lines+markers',
-            line=dict(color='#0066FF', width=2),
-            marker=dict(size=8),
-            name='Historical'
-        ))
-        
-        if len(forecast_months) > 0:
-            fig.add_trace(go.Scatter(
-                x=[month_names[m] for m in forecast_months],
-                y=forecast_values,
-                mode='lines+markers',
-                line=dict(color='#00AA55', width=2, dash='dot'),
-                marker=dict(size=8, symbol='diamond'),
-                name='Forecast'
-            ))
-        
-        fig.update_layout(
-            **CHART_LAYOUT,
-            height=400,
-            legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1, font=dict(color=theme['chart_text'])),
-            xaxis=dict(showgrid=False, title=dict(text='Month', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT),
-            yaxis=dict(showgrid=True, gridcolor=theme['grid'], tickformat='$,.0s', title=dict(text='Revenue', font=AXIS_TICKFONT), tickfont=AXIS_TICKFONT)
-        )
-        st.plotly_chart(fig, use_container_width=True)
-        
-        if len(forecast_values) > 0:
-            total_forecast = sum(forecast_values)
-            st.markdown(f"""
-            <div class="summary-box">
-                <h3>Q1 2026 Projected Revenue</h3>
-                <ul>
-                    <li><strong>Total Projected:</strong> {format_currency(total_forecast)}</li>
-                    <li><strong>Method:</strong> Linear regression on 2019 monthly trends</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
+            if len(forecast_values) > 0:
+                total_forecast = sum(forecast_values)
+                method = ("Linear regression on 2019 monthly trends" if (forecast_model, forecast_granularity) == ('linear', 'month')
+                          else f"{forecasting.MODELS[forecast_model]} on 2019 {GRANULARITIES[forecast_granularity].lower()} sales")
+                accuracy = forecast['accuracy']
+                backtest = ("not enough history" if not accuracy['Origins']
+                            else f"{accuracy['sMAPE']:.1f}% sMAPE, {format_currency(accuracy['MAE'])} MAE over {accuracy['Origins']:.0f} origins")
+                st.markdown(f"""
+                <div class="summary-box">
+                    <h3>Q1 2026 Projected Revenue</h3>
+                    <ul>
+                        <li><strong>Total Projected:</strong> {format_currency(total_forecast)}</li>
+                        <li><strong>Method:</strong> {method}</li>
+                        <li><strong>Backtest:</strong> {backtest}</li>
+                    </ul>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            if forecast_granularity == 'month':
+                st.markdown('<div class="section-title">All Series</div>', unsafe_allow_html=True)
+                
+                # Every City / Product series is forecast in the same batch, so the
+                # full table costs nothing beyond the selected slice's forecast
+                series = analytics.series_forecasts(forecast_model)
+                series_table = series['forecast'].rename(columns=month_label)
+                series_table['Total Projected'] = series_table.sum(axis=1)
+                series_table = series_table.join(series['backtest'][['MAE', 'sMAPE']]).reset_index()
+                st.dataframe(
+                    series_table,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        column: st.column_config.NumberColumn(format="$%.0f")
+                        for column in series_table.columns[2:-1]
+                    } | {'sMAPE': st.column_config.NumberColumn("sMAPE (%)", format="%.1f")}
+                )
+                st.caption(f"{len(series_table):,} series (City x Product, per City, per Product and total); "
+                           f"accuracy from a rolling-origin backtest over {series['backtest']['Origins'].max():.0f} origins")
+
+# ============================================
+# Render
+# ============================================
+with tab1:
+    if tab_is_active(tab1):
+        render_executive_pulse()
+
+with tab2:
+    if tab_is_active(tab2):
+        render_revenue_marketing()
+
+with tab3:
+    if tab_is_active(tab3):
+        render_regional_insights()
+
+with tab4:
+    if tab_is_active(tab4):
+        render_data_explorer()
+
+# ============================================
+# Admin Panel
+# ============================================
+if st.query_params.get('admin') == '1':
+    with st.expander("Performance", expanded=True):
+        st.caption(f"Per-stage timings over the last {TIMING_WINDOW} samples in this process")
+        st.dataframe(timings.stats(), use_container_width=True, hide_index=True)
+
+timings.end_run()
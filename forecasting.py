@@ -0,0 +1,131 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# ============================================
+# Batched Forecasting
+# ============================================
+# Every series (all sales, each City, each Product, each City x Product) is a
+# row of one months-by-series matrix, and each model fits all rows at once:
+# the regression models solve a single stacked least-squares problem shared by
+# every series, and Holt's smoothing steps through the months with the whole
+# matrix (and every smoothing parameter on the grid) as arrays. Forecasting
+# every series therefore costs about as much as forecasting one.
+ALL = 'All'
+SERIES_DIMENSIONS = ['City', 'Product']
+MODELS = {
+    'linear': 'Linear trend',
+    'holt': "Holt's exponential smoothing",
+    'seasonal': 'Linear trend with monthly seasonality',
+}
+SEASON_LENGTH = 12
+HOLT_GRID = [0.1, 0.3, 0.5, 0.7, 0.9]
+BACKTEST_MIN_TRAIN = 6
+
+def series_matrix(sales):
+    """Monthly sales per series from City/Product/Month sales, one row per series.
+
+    The index is (City, Product) with ALL marking an unfiltered dimension; the
+    columns are every month between the first and the last, missing months as 0.
+    """
+    months = np.arange(sales['Month'].min(), sales['Month'].max() + 1)
+    pairs = (sales.groupby(SERIES_DIMENSIONS + ['Month'], observed=True)['Sales'].sum()
+             .unstack('Month', fill_value=0).reindex(columns=months, fill_value=0))
+    cities = pairs.groupby(level='City', observed=True).sum()
+    products = pairs.groupby(level='Product', observed=True).sum()
+    keys = ([(ALL, ALL)] + [(city, ALL) for city in cities.index]
+            + [(ALL, product) for product in products.index] + list(pairs.index))
+    values = np.vstack([pairs.to_numpy().sum(axis=0, keepdims=True), cities.to_numpy(),
+                        products.to_numpy(), pairs.to_numpy()]).astype(np.float64)
+    return pd.DataFrame(values, index=pd.MultiIndex.from_tuples(keys, names=SERIES_DIMENSIONS), columns=months)
+
+def min_history(model):
+    return 2 * SEASON_LENGTH if model == 'seasonal' else 3
+
+def available_models(periods):
+    return [model for model in MODELS if periods >= min_history(model)]
+
+# ============================================
+# Models
+# ============================================
+# Each forecaster takes a (series, months) array and returns (series, horizon)
+def regression_forecast(Y, horizon, seasonal=False):
+    periods = Y.shape[1]
+    t = np.arange(periods + horizon, dtype=np.float64)
+    columns = [np.ones_like(t), t]
+    if seasonal:
+        # One dummy per month of the season but the first, which the intercept covers
+        columns += [(t % SEASON_LENGTH == month).astype(np.float64) for month in range(1, SEASON_LENGTH)]
+    X = np.column_stack(columns)
+    # One solve for every series: the design matrix is shared, the series are the columns of Y.T
+    coefficients, *_ = np.linalg.lstsq(X[:periods], Y.T, rcond=None)
+    return (X[periods:] @ coefficients).T
+
+def linear_forecast(Y, horizon):
+    return regression_forecast(Y, horizon)
+
+def seasonal_forecast(Y, horizon):
+    if Y.shape[1] < min_history('seasonal'):
+        return np.full((len(Y), horizon), np.nan)
+    return regression_forecast(Y, horizon, seasonal=True)
+
+def holt_forecast(Y, horizon):
+    """Additive-trend exponential smoothing, parameters chosen per series by one-step-ahead error."""
+    if Y.shape[1] < 2:
+        return np.full((len(Y), horizon), np.nan)
+    alphas, betas = (np.array(grid)[:, None, None] for grid in zip(*itertools.product(HOLT_GRID, HOLT_GRID)))
+    # Arrays are (parameter pairs, series, 1): every pair and series is smoothed together
+    level = np.broadcast_to(Y[None, :, :1], (len(alphas), len(Y), 1)).copy()
+    trend = np.broadcast_to(Y[None, :, 1:2] - Y[None, :, :1], level.shape).copy()
+    sse = np.zeros(level.shape)
+    for month in range(1, Y.shape[1]):
+        observed = Y[None, :, month:month + 1]
+        predicted = level + trend
+        sse += (observed - predicted) ** 2
+        new_level = alphas * observed + (1 - alphas) * predicted
+        trend = betas * (new_level - level) + (1 - betas) * trend
+        level = new_level
+    best = sse.argmin(axis=0)[None]
+    level = np.take_along_axis(level, best, axis=0)[0]
+    trend = np.take_along_axis(trend, best, axis=0)[0]
+    return level + trend * np.arange(1, horizon + 1)
+
+FORECASTERS = {
+    'linear': linear_forecast,
+    'holt': holt_forecast,
+    'seasonal': seasonal_forecast,
+}
+
+def forecast_series(series, model='linear', horizon=3):
+    """Forecasts for every row of ``series_matrix`` output, one column per future month."""
+    future = np.arange(series.columns[-1] + 1, series.columns[-1] + 1 + horizon)
+    values = FORECASTERS[model](series.to_numpy(), horizon)
+    return pd.DataFrame(values, index=series.index, columns=future)
+
+# ============================================
+# Backtesting
+# ============================================
+def backtest_series(series, model='linear', horizon=3, min_train=BACKTEST_MIN_TRAIN, step=1):
+    """Rolling-origin backtest: refit on the periods before each origin and score the next ``horizon``.
+
+    Origins are ``step`` periods apart. Returns MAE and sMAPE (percent) per
+    series over every origin; NaN when the history is too short for any origin.
+    """
+    Y = series.to_numpy()
+    min_train = max(min_train, min_history(model))
+    errors, scales = [], []
+    for origin in range(min_train, Y.shape[1] - horizon + 1, step):
+        predicted = FORECASTERS[model](Y[:, :origin], horizon)
+        actual = Y[:, origin:origin + horizon]
+        errors.append(np.abs(actual - predicted))
+        scales.append(np.abs(actual) + np.abs(predicted))
+    if not errors:
+        return pd.DataFrame({'MAE': np.nan, 'sMAPE': np.nan, 'Origins': 0}, index=series.index)
+    errors, scales = np.concatenate(errors, axis=1), np.concatenate(scales, axis=1)
+    smape = np.divide(2 * errors, scales, out=np.zeros_like(errors), where=scales > 0)
+    return pd.DataFrame({
+        'MAE': errors.mean(axis=1),
+        'sMAPE': smape.mean(axis=1) * 100,
+        'Origins': errors.shape[1] // horizon,
+    }, index=series.index)
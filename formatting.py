@@ -0,0 +1,78 @@
+import functools
+import string
+
+import numpy as np
+
+# ============================================
+# Number Formatting
+# ============================================
+# Labels for KPIs, cards and tables: values of a million or more as $1.23M,
+# of a thousand or more as $4.5K, anything smaller as is. Each formatter takes
+# one number or a whole array; arrays are formatted in one vectorized pass
+# (format_array) that prints exactly what the scalar path would.
+def format_currency(value):
+    if np.ndim(value):
+        return format_array(value, format_currency, prefix='$', plain_digits=2)
+    if value >= 1e6:
+        return f"${value/1e6:.2f}M"
+    elif value >= 1e3:
+        return f"${value/1e3:.1f}K"
+    return f"${value:.2f}"
+
+def format_number(value):
+    if np.ndim(value):
+        return format_array(value, format_number, plain_digits=0)
+    if value >= 1e6:
+        return f"{value/1e6:.2f}M"
+    elif value >= 1e3:
+        return f"{value/1e3:.1f}K"
+    return f"{value:,.0f}"
+
+def format_array(values, scalar, prefix='', plain_digits=0):
+    """``scalar`` applied to every value of an array, as a StringDType array.
+
+    Each value is rounded to whole units of its last printed digit and its
+    characters are written a column at a time into one byte matrix, read back
+    as strings. The few values that path would print differently go through
+    ``scalar``: negative or non-finite ones, plain values needing digit
+    grouping, and those within float error of a rounding halfway point.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    millions, thousands = values >= 1e6, (values >= 1e3) & (values < 1e6)
+    digits = np.where(millions, 2, np.where(thousands, 1, plain_digits))
+    with np.errstate(invalid='ignore'):
+        scaled = values / np.where(millions, 1e6, np.where(thousands, 1e3, 1.0)) * 10.0 ** digits
+        exact = (values >= 0) & (scaled < 1e15) & (np.abs(scaled - np.trunc(scaled) - 0.5) > 1e-6)
+    units = np.rint(np.where(exact, scaled, 0)).astype(np.int64)
+    exact &= millions | thousands | (units < 10 ** (3 + digits))
+    whole, fraction = np.divmod(units, 10 ** digits)
+    suffix = np.where(millions, ord('M'), np.where(thousands, ord('K'), 0))
+    # Whole digits right-aligned in spaces, then the point, the fraction digits
+    # and the suffix; the zero bytes after them end each bytes string
+    width = len(str(whole.max(initial=0)))
+    chars = np.zeros((len(values), width + 4), dtype=np.uint8)
+    for column in range(width - 1, -1, -1):
+        chars[:, column] = np.where((whole > 0) | (column == width - 1), ord('0') + whole % 10, ord(' '))
+        whole = whole // 10
+    tens, ones = np.divmod(fraction, 10)
+    chars[:, width] = np.where(digits > 0, ord('.'), suffix)
+    chars[:, width + 1] = np.where(digits == 2, ord('0') + tens, np.where(digits == 1, ord('0') + ones, 0))
+    chars[:, width + 2] = np.where(digits == 2, ord('0') + ones, np.where(digits == 1, suffix, 0))
+    chars[:, width + 3] = np.where(digits == 2, suffix, 0)
+    text = np.strings.lstrip(chars.view(f'S{width + 4}')[:, 0])
+    text = np.strings.add(prefix.encode(), text).astype(np.dtypes.StringDType())
+    text[~exact] = [scalar(float(value)) for value in values[~exact]]
+    return text
+
+# ============================================
+# Card Templates
+# ============================================
+def fill_cards(template, **columns):
+    """``template`` filled once per card, concatenated; each field is a column of values or one for every card."""
+    pieces = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        if literal:
+            pieces.append(literal)
+        if field is not None:
+            pieces.append(np.asarray(columns[field]).astype(np.dtypes.StringDType()))
+    return ''.join(np.atleast_1d(functools.reduce(np.strings.add, pieces)).tolist())
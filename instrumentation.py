@@ -0,0 +1,120 @@
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# ============================================
+# Timing Spans
+# ============================================
+# Named spans time each stage of a rerun (loading, filters, queries, figure
+# builds, chart serialization). The recorder keeps the last `window` durations
+# per span for the p50/p95 admin panel. With an export path it also writes each
+# run's spans as JSON lines, or rewrites a Prometheus text-format summary that a
+# node_exporter textfile collector can scrape.
+EXPORT_FORMATS = ['jsonl', 'prometheus']
+
+class SpanRecorder:
+    def __init__(self, window=200, export_path=None, export_format='jsonl'):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown timing export format {export_format!r}; expected one of {EXPORT_FORMATS}")
+        self.window = window
+        self.export_path = export_path
+        self.export_format = export_format
+        self._recent = defaultdict(lambda: deque(maxlen=window))
+        self._totals = defaultdict(lambda: [0, 0.0])  # span -> [count, seconds]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator form of span()."""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._recent[name].append(seconds)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += seconds
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending.append((name, seconds))
+
+    # A run groups the spans recorded by one thread between begin_run() and
+    # end_run(), i.e. one script rerun of one session
+    def begin_run(self):
+        self._local.run_id = uuid.uuid4().hex[:12]
+        self._local.started = time.perf_counter()
+        self._local.pending = []
+
+    def end_run(self, name='rerun'):
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            return
+        self._local.pending = None
+        seconds = time.perf_counter() - self._local.started
+        self.record(name, seconds)
+        pending.append((name, seconds))
+        if self.export_path:
+            self.export(self._local.run_id, pending)
+
+    def stats(self):
+        with self._lock:
+            recent = {name: np.array(durations) for name, durations in self._recent.items()}
+        rows = [(name, len(durations), *np.percentile(durations, [50, 95]) * 1000, durations[-1] * 1000)
+                for name, durations in sorted(recent.items()) if len(durations)]
+        return pd.DataFrame(rows, columns=['Stage', 'Samples', 'p50 (ms)', 'p95 (ms)', 'Last (ms)'])
+
+    def export(self, run_id, spans):
+        if self.export_format == 'prometheus':
+            self.write_prometheus(self.export_path)
+            return
+        now = time.time()
+        lines = ''.join(json.dumps({'ts': now, 'run': run_id, 'span': name, 'ms': round(seconds * 1000, 3)}) + '\n'
+                        for name, seconds in spans)
+        with self._lock, open(self.export_path, 'a') as f:
+            f.write(lines)
+
+    def prometheus_text(self, metric='dashboard_span_seconds'):
+        with self._lock:
+            recent = {name: np.array(durations) for name, durations in self._recent.items()}
+            totals = {name: tuple(total) for name, total in self._totals.items()}
+        lines = [
+            f'# HELP {metric} Duration of dashboard stages, quantiles over the last {self.window} samples',
+            f'# TYPE {metric} summary',
+        ]
+        for name in sorted(recent):
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            for quantile in (0.5, 0.95):
+                value = np.quantile(recent[name], quantile) if len(recent[name]) else float('nan')
+                lines.append(f'{metric}{{span="{label}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'{metric}_sum{{span="{label}"}} {totals[name][1]:.6f}')
+            lines.append(f'{metric}_count{{span="{label}"}} {totals[name][0]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        # Written aside and renamed so a scraper never reads a partial file
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
@@ -0,0 +1,619 @@
+import contextlib
+import glob
+import os
+import pathlib
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+
+try:
+    import duckdb
+except ImportError:  # optional: only needed for QUERY_BACKEND=duckdb
+    duckdb = None
+
+# ============================================
+# Query Backends
+# ============================================
+# The dashboard asks a backend for named aggregates over the City / Month /
+# Product filters. PandasBackend answers them from the in-memory SalesStore
+# state; SQLBackend pushes the filters and aggregates down to a SQLite or DuckDB
+# file, so the rows live in the OS page cache (shared by every worker process)
+# instead of in each worker's heap. Both return the same shapes.
+QUERY_NAMES = [
+    'totals', 'distinct_orders', 'monthly_sales', 'hourly_sales', 'day_sales', 'city_sales',
+    'product_sales', 'product_units', 'heatmap', 'city_performance', 'product_stats', 'series_sales',
+    'daily_sales',
+]
+
+# The Live Worksheet is paged: worksheet() returns one page of matching rows and
+# whether another page follows. Searches match the product names (a few dozen
+# distinct values) once and select rows through the Product index, and unsorted
+# pages stop reading candidates as soon as the page is full.
+WORKSHEET_COLUMNS = ['Order ID', 'Product', 'Quantity Ordered', 'Price Each', 'Sales', 'City', 'Order Date']
+WORKSHEET_PAGE_SIZE = 100
+
+def match_products(products, search):
+    """Product names containing ``search``, ignoring case."""
+    search = search.casefold()
+    return [product for product in products if search in product.casefold()]
+
+def lexical(values):
+    # Sort categoricals by their labels, as the SQL backends do, not by category order
+    return values.astype(str) if isinstance(values.dtype, pd.CategoricalDtype) else values
+
+def numeric(values):
+    """A column as a NumPy array; nullable integers (columns with blank cells) become floats with NaN."""
+    if pd.api.types.is_extension_array_dtype(values.dtype):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return values.to_numpy()
+
+def sort_key(values, positions):
+    """Numeric keys that order like ``values`` at ``positions``, so a descending sort is a stable sort of ``-key``."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        ranks = np.argsort(np.argsort(values.cat.categories.to_numpy(dtype=object)))
+        return ranks[values.cat.codes.to_numpy()[positions]]
+    values = numeric(values.iloc[positions])
+    return values.view(np.int64) if values.dtype.kind == 'M' else values
+
+def smallest(keys, k):
+    """Indices of the ``k`` smallest keys in stable sorted order; a partition leaves the rest unsorted."""
+    indices = np.arange(len(keys))
+    if 0 < k < len(keys):
+        threshold = np.partition(keys, k - 1)[k - 1]
+        if threshold != threshold:
+            # NaN keys (blank cells) sort last; a page reaching them orders every key
+            return np.argsort(keys, kind='stable')
+        below = np.flatnonzero(keys < threshold)
+        indices = np.concatenate([below, np.flatnonzero(keys == threshold)[:k - len(below)]])
+    return indices[np.argsort(keys[indices], kind='stable')]
+
+class PandasBackend:
+    """Queries over a SalesStore state: the row index for exact counts, the cube for everything else."""
+
+    def __init__(self, state, distinct_mode='exact', source=None, chunk_rows=data_loader.CHUNK_ROWS):
+        self.version = state['version']
+        self.updated_at = state['updated_at']
+        self.df = state['df']
+        self.filter_index = state['filter_index']
+        self.summaries = state['summaries']
+        self.cube, self.cube_index = self.summaries['cube'], self.summaries['cube_index']
+        self.distinct_mode = distinct_mode
+        self.source = source
+        self.chunk_rows = chunk_rows
+
+    def run(self, name, filters):
+        return getattr(self, name)(filters)
+
+    def filter_options(self):
+        return {column: sorted(values) for column, values in self.cube_index.items()}
+
+    def date_min(self):
+        return self.summaries['date_min']
+
+    # Intersect index position lists, then gather only the matching rows / cube cells
+    def filter_rows(self, filters, columns=None):
+        """The rows matching ``filters``, only ``columns`` of them when given."""
+        df = self.df if columns is None else self.df[columns]
+        positions = data_loader.select_rows(self.filter_index, filters)
+        return df if positions is None else df.take(positions)
+
+    def filter_cube(self, filters):
+        positions = data_loader.select_rows(self.cube_index, filters)
+        return self.cube if positions is None else self.cube.take(positions)
+
+    # Streaming mode keeps no rows: scan the CSV chunk by chunk until `limit` rows
+    # match, or, when sorting, keep only the first `limit` rows seen so far
+    def scan_rows(self, filters, limit, predicate, sort=None, ascending=True):
+        found, count = [], 0
+        for chunk in data_loader.iter_sales_chunks(self.source, self.chunk_rows):
+            for column, value in filters.items():
+                chunk = chunk[chunk[column] == value]
+            if sort is not None:
+                found = [data_loader.concat_frames(found + [predicate(chunk)])
+                         .sort_values(sort, ascending=ascending, kind='stable', key=lexical).head(limit)]
+                continue
+            found.append(predicate(chunk).head(limit - count))
+            count += len(found[-1])
+            if count >= limit:
+                break
+        return data_loader.concat_frames(found)
+
+    def search_rows(self, filters, search, cache=None):
+        """The products matching ``search`` and the sorted positions of their rows within the filters.
+
+        With a ``cache`` (a QueryCache) the result is memoised, and a search that
+        extends a cached one ("ipho" after "iph") narrows that result instead of
+        starting over from the index.
+        """
+        filter_key = tuple(sorted(filters.items()))
+        search = search.casefold()
+
+        def compute():
+            for end in range(len(search) - 1, 0, -1):
+                previous = cache.get((self.version, 'search_rows', filter_key, search[:end])) if cache else None
+                if previous is None:
+                    continue
+                products, positions = previous
+                narrowed = match_products(products, search)
+                if len(narrowed) < len(products):
+                    product_codes = self.df['Product'].cat.categories.get_indexer(narrowed)
+                    positions = positions[np.isin(self.df['Product'].cat.codes.to_numpy()[positions], product_codes)]
+                return narrowed, positions
+
+            product_index = self.filter_index['Product']
+            products = match_products(product_index, search)
+            hits = [product_index[product] for product in products]
+            positions = np.sort(np.concatenate(hits)) if hits else np.empty(0, dtype=np.int64)
+            selected = data_loader.select_rows(self.filter_index, filters)
+            if selected is not None:
+                positions = data_loader.intersect_sorted(selected, positions)
+            return products, positions
+
+        if cache is None:
+            return compute()
+        return cache.get_or_compute((self.version, 'search_rows', filter_key, search), compute)
+
+    def worksheet(self, filters, search='', min_quantity=1, page=0, page_size=WORKSHEET_PAGE_SIZE,
+                  sort=None, ascending=True, cache=None):
+        # One row past the page tells whether there is a next page
+        start, stop = page * page_size, (page + 1) * page_size + 1
+        if self.df is None:
+            products = match_products(self.filter_options()['Product'], search) if search else None
+
+            def matching(rows):
+                if products is not None:
+                    rows = rows[rows['Product'].isin(products)]
+                return rows[rows['Quantity Ordered'] >= min_quantity]
+
+            rows = self.scan_rows(filters, stop, matching, sort, ascending).iloc[start:stop]
+            return rows[WORKSHEET_COLUMNS].head(page_size), len(rows) > page_size
+
+        if search:
+            _, positions = self.search_rows(filters, search, cache)
+        else:
+            positions = data_loader.select_rows(self.filter_index, filters)
+        total = len(self.df) if positions is None else len(positions)
+        quantity = numeric(self.df['Quantity Ordered'])
+        if sort is None:
+            # Check candidates in doubling blocks until the page is full
+            selected, count, begin, block = [], 0, 0, max(stop, 1024)
+            while begin < total and count < stop:
+                end = min(begin + block, total)
+                candidates = np.arange(begin, end) if positions is None else positions[begin:end]
+                selected.append(candidates[quantity[candidates] >= min_quantity])
+                count += len(selected[-1])
+                begin, block = end, block * 2
+            matched = np.concatenate(selected)[start:stop] if selected else np.empty(0, dtype=np.int64)
+        else:
+            candidates = np.arange(total) if positions is None else positions
+            candidates = candidates[quantity[candidates] >= min_quantity]
+            key = sort_key(self.df[sort], candidates)
+            # Only the rows up to the end of the page are ordered
+            matched = candidates[smallest(key if ascending else -key, stop)[start:stop]]
+        rows = self.df.take(matched[:page_size])[WORKSHEET_COLUMNS]
+        return rows, len(matched) > page_size
+
+    def distinct_orders(self, filters, by=None):
+        if self.distinct_mode == 'sketch':
+            positions = data_loader.select_rows(self.summaries['sketch_index'], filters)
+            return data_loader.sketch_distinct(self.summaries['sketches'], positions, by)
+        rows = self.filter_rows(filters, ['Order ID'] + ([] if by is None else [by]))
+        if by is None:
+            return rows['Order ID'].nunique()
+        return rows.groupby(by, observed=True)['Order ID'].nunique()
+
+    def totals(self, filters):
+        cube_df = self.filter_cube(filters)
+        return {column: cube_df[column].sum() for column in ['Sales', 'Quantity Ordered', 'Order Lines']}
+
+    def monthly_sales(self, filters):
+        return self.filter_cube(filters).groupby('Month')['Sales'].sum()
+
+    def hourly_sales(self, filters):
+        return self.filter_cube(filters).groupby('Hour')['Sales'].sum()
+
+    def day_sales(self, filters):
+        return self.filter_cube(filters).groupby('Day_of_Week', observed=True)['Sales'].sum()
+
+    def city_sales(self, filters):
+        return self.filter_cube(filters).groupby('City', observed=True)['Sales'].sum()
+
+    def product_sales(self, filters):
+        return self.filter_cube(filters).groupby('Product', observed=True)['Sales'].sum()
+
+    def product_units(self, filters):
+        return self.filter_cube(filters).groupby('Product', observed=True)['Quantity Ordered'].sum()
+
+    def heatmap(self, filters):
+        heatmap_data = self.filter_cube(filters).groupby(['Day_of_Week', 'Hour'], observed=True)['Sales'].sum().unstack(fill_value=0)
+        return heatmap_data.reindex(data_loader.DAY_NAMES)
+
+    def city_performance(self, filters):
+        city_performance = self.filter_cube(filters).groupby('City', observed=True).agg({
+            'Sales': 'sum',
+            'Quantity Ordered': 'sum'
+        })
+        city_performance['Orders'] = self.distinct_orders(filters, by='City')
+        city_performance = city_performance.reset_index()
+        city_performance.columns = ['City', 'Revenue', 'Units', 'Orders']
+        return city_performance
+
+    def product_stats(self, filters):
+        product_stats = self.filter_cube(filters).groupby('Product', observed=True).agg({
+            'Sales': 'sum',
+            'Quantity Ordered': 'sum'
+        })
+        product_stats['Orders'] = self.distinct_orders(filters, by='Product')
+        product_stats = product_stats.reset_index()
+        product_stats.columns = ['Product', 'Revenue', 'Units', 'Orders']
+        return product_stats
+
+    def series_sales(self, filters):
+        """Sales per City, Product and Month, the input of the batched forecasts."""
+        return self.filter_cube(filters).groupby(['City', 'Product', 'Month'], observed=True)['Sales'].sum().reset_index()
+
+    def daily_sales(self, filters):
+        """Sales per calendar day from the daily rollup (see data_loader.roll_up for weeks and months)."""
+        positions = data_loader.select_rows(self.summaries['daily_index'], filters)
+        daily = self.summaries['daily'] if positions is None else self.summaries['daily'].take(positions)
+        return daily.groupby('Date')['Sales'].sum()
+
+# ============================================
+# SQL Database
+# ============================================
+# The database holds one `sales` table with the same columns as the in-memory
+# frame (categoricals stored as text), a `sales_daily` rollup (see
+# data_loader.build_daily_rollup) and a `sales_meta` table recording the source
+# version and DATABASE_SCHEMA it was built with. It is built from the CSVs, chunk by chunk,
+# into a temporary file renamed into place once complete, so readers never see
+# a half-written table. Each source version gets a file of its own (see
+# database_file) rather than replacing the previous one, which reruns that
+# started on the previous version may still be reading.
+SQL_ENGINES = ['sqlite', 'duckdb']
+DATABASE_SCHEMA = '2'  # bump when the tables change so existing databases are rebuilt
+SQLITE_MMAP_BYTES = 1 << 30
+MAX_IDLE_CONNECTIONS = 4
+
+def quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+def connect_database(database, engine, read_only=True):
+    if engine == 'duckdb':
+        if duckdb is None:
+            raise ImportError("QUERY_BACKEND=duckdb needs the duckdb package (pip install duckdb)")
+        return duckdb.connect(database, read_only=read_only)
+    if engine != 'sqlite':
+        raise ValueError(f"Unknown SQL engine {engine!r}; expected one of {SQL_ENGINES}")
+    if not read_only:
+        return sqlite3.connect(database)
+    # Pooled connections are borrowed by whichever thread runs the next query
+    connection = sqlite3.connect(pathlib.Path(database).absolute().as_uri() + '?mode=ro', uri=True,
+                                 check_same_thread=False)
+    # Read through a memory map so every process shares the page cache copy
+    connection.execute(f'PRAGMA mmap_size = {SQLITE_MMAP_BYTES}')
+    return connection
+
+def database_file(database, version):
+    root, extension = os.path.splitext(database)
+    return f'{root}-{version}{extension}'
+
+def database_version(database, engine):
+    """The source version recorded in ``database``, or None if it is missing, unreadable or an older schema."""
+    if not os.path.exists(database):
+        return None
+    try:
+        connection = connect_database(database, engine)
+        try:
+            meta = dict(connection.execute('SELECT key, value FROM sales_meta').fetchall())
+        finally:
+            connection.close()
+    except Exception:  # sqlite3 and duckdb raise unrelated error types
+        return None
+    return meta.get('source_version') if meta.get('schema') == DATABASE_SCHEMA else None
+
+def sql_frame(chunk):
+    return chunk.astype({column: str for column, dtype in chunk.dtypes.items()
+                         if isinstance(dtype, pd.CategoricalDtype)})
+
+def build_database(source, database, engine='sqlite', chunk_rows=data_loader.CHUNK_ROWS):
+    """Build the database of the current source version as ``database_file(database, version)``; returns the version."""
+    paths = data_loader.resolve_sources(source)
+    version = data_loader.source_version(paths)
+    database = database_file(database, version)
+    os.makedirs(os.path.dirname(database) or '.', exist_ok=True)
+    tmp = f'{database}.{os.getpid()}.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    connection = connect_database(tmp, engine, read_only=False)
+    try:
+        for chunk in data_loader.iter_sales_chunks(paths, chunk_rows):
+            chunk = sql_frame(chunk)
+            if engine == 'duckdb':
+                connection.register('chunk', chunk)
+                connection.execute('CREATE TABLE IF NOT EXISTS sales AS SELECT * FROM chunk LIMIT 0')
+                connection.execute('INSERT INTO sales SELECT * FROM chunk')
+                connection.unregister('chunk')
+            else:
+                chunk.to_sql('sales', connection, if_exists='append', index=False)
+        connection.execute('CREATE TABLE sales_meta (key TEXT PRIMARY KEY, value TEXT)')
+        connection.execute("INSERT INTO sales_meta VALUES ('source_version', ?)", [version])
+        connection.execute("INSERT INTO sales_meta VALUES ('schema', ?)", [DATABASE_SCHEMA])
+        day = 'CAST("Order Date" AS DATE)' if engine == 'duckdb' else 'date("Order Date")'
+        dimensions = ', '.join(quote(column) for column in data_loader.ROLLUP_DIMENSIONS[:-1])
+        connection.execute(f'CREATE TABLE sales_daily AS SELECT {dimensions}, {day} AS "Date", SUM("Sales") AS "Sales" '
+                           f'FROM sales WHERE "Order Date" IS NOT NULL GROUP BY {dimensions}, {day}')
+        if engine == 'sqlite':
+            # DuckDB prunes with its own min/max zone maps; SQLite needs indexes
+            for column in data_loader.FILTER_COLUMNS:
+                connection.execute(f'CREATE INDEX sales_{column.lower()} ON sales ({quote(column)})')
+            connection.execute('ANALYZE')
+            connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp, database)
+    return version
+
+def where_clause(filters, extra=()):
+    conditions = [f'{quote(column)} = ?' for column in filters] + [condition for condition, _ in extra]
+    params = list(filters.values()) + [value for _, values in extra for value in values]
+    return ('WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+def database_summary(database, engine):
+    """The filter options and first order day, read once per database version."""
+    connection = connect_database(database, engine)
+    try:
+        options = {column: [value for value, in connection.execute(f'SELECT DISTINCT {quote(column)} FROM sales ORDER BY 1').fetchall()]
+                   for column in data_loader.FILTER_COLUMNS}
+        # The daily rollup is a few rows per day; "Order Date" has no index to answer MIN from
+        (date_min,), = connection.execute('SELECT MIN("Date") FROM sales_daily').fetchall()
+    finally:
+        connection.close()
+    return options, pd.Timestamp(date_min)
+
+# ============================================
+# Connection Pool
+# ============================================
+# Streamlit runs every rerun on a fresh ScriptRunner thread, so a connection
+# cached per thread would never be reused. Instead the read-only connections of
+# each database file are pooled: a query borrows one, and it goes back to the
+# pool once the rows are fetched, so no two threads use it at the same time.
+class ConnectionPool:
+    def __init__(self, engine, size=MAX_IDLE_CONNECTIONS):
+        self.engine = engine
+        self.size = size
+        self.idle = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def connection(self, database):
+        with self._lock:
+            idle = self.idle.get(database)
+            connection = idle.pop() if idle else None
+        if connection is None:
+            connection = connect_database(database, self.engine)
+        try:
+            yield connection
+        finally:
+            with self._lock:
+                idle = self.idle.setdefault(database, [])
+                pooled = len(idle) < self.size
+                if pooled:
+                    idle.append(connection)
+            if not pooled:
+                connection.close()
+
+    def retain(self, database):
+        """Close the idle connections of every database file but ``database``."""
+        with self._lock:
+            stale = [connections for name, connections in self.idle.items() if name != database]
+            self.idle = {database: self.idle.get(database, [])}
+        for connection in (connection for connections in stale for connection in connections):
+            connection.close()
+
+# ============================================
+# SQL Store
+# ============================================
+# Process-wide holder of the current database, as SalesStore is for the rows.
+# refresh() builds the file of a new source version (or picks up the one
+# another process already built) and publishes a new state dict naming it;
+# a rerun wraps the state current when it starts in an SQLBackend and keeps it
+# to the end, so a refresh mid-rerun never mixes two versions in one page.
+# Without a source the database file is used as is, versioned by its stat.
+class SQLStore:
+    def __init__(self, database, engine='sqlite', source=None, chunk_rows=data_loader.CHUNK_ROWS):
+        self.database = database
+        self.engine = engine
+        self.source = source
+        self.chunk_rows = chunk_rows
+        self.state = None
+        # Read-only connections to the current database, shared by every rerun's backend
+        self.connections = ConnectionPool(engine)
+        self._lock = threading.Lock()
+
+    def current_version(self):
+        if self.source is None:
+            stat = data_loader.file_stat(self.database)
+            return f"{stat['size']}:{stat['mtime_ns']}"
+        return data_loader.source_version(self.source)
+
+    def refresh(self):
+        """Bring the state up to date with the source files (or the database file) and return it."""
+        version = self.current_version()
+        state = self.state
+        if state is not None and state['version'] == version:
+            return state
+        with self._lock:
+            state = self.state
+            if state is None or state['version'] != version:
+                state = self.load(version)
+                self.remove_stale(state)
+                self.state = state
+                self.connections.retain(state['database'])
+            return state
+
+    def load(self, version):
+        if self.source is None:
+            database = self.database
+            updated_at = data_loader.file_stat(database)['mtime_ns']
+        else:
+            paths = data_loader.resolve_sources(self.source)
+            updated_at = max(data_loader.file_stat(path)['mtime_ns'] for path in paths)
+            if database_version(database_file(self.database, version), self.engine) != version:
+                version = build_database(paths, self.database, self.engine, self.chunk_rows)
+            database = database_file(self.database, version)
+        options, date_min = database_summary(database, self.engine)
+        return {
+            'version': version,
+            'updated_at': updated_at / 1e9,
+            'database': database,
+            'engine': self.engine,
+            'options': options,
+            'date_min': date_min,
+        }
+
+    def remove_stale(self, state):
+        """Delete the files of versions older than both the new state and the one it replaces."""
+        if self.source is None:
+            return
+        keep = {state['database']} | ({self.state['database']} if self.state else set())
+        try:
+            oldest = min(data_loader.file_stat(database)['mtime_ns'] for database in keep)
+        except OSError:
+            return
+        root, extension = os.path.splitext(self.database)
+        # Files at least as new as the kept ones belong to processes that are ahead of this one
+        for stale in glob.glob(glob.escape(root) + '-*' + glob.escape(extension)):
+            try:
+                if stale not in keep and data_loader.file_stat(stale)['mtime_ns'] < oldest:
+                    os.remove(stale)
+            except OSError:
+                pass
+
+# ============================================
+# SQL Backend
+# ============================================
+class SQLBackend:
+    """Queries pushed down to the SQLite or DuckDB ``sales`` table of one SQLStore state.
+
+    Pass the store's ``connections`` so reruns reuse its pooled read-only
+    connections instead of opening their own.
+    """
+
+    def __init__(self, state, distinct_mode='exact', connections=None):
+        self.state = state
+        self.version = state['version']
+        self.updated_at = state['updated_at']
+        self.database = state['database']
+        self.engine = state['engine']
+        self.distinct_mode = distinct_mode
+        self.connections = ConnectionPool(self.engine) if connections is None else connections
+
+    def query(self, sql, params=()):
+        with self.connections.connection(self.database) as connection:
+            cursor = connection.execute(sql, params)
+            columns = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+        return pd.DataFrame(rows, columns=columns)
+
+    def grouped(self, filters, by, aggregates, table='sales'):
+        where, params = where_clause(filters)
+        group = ', '.join(quote(column) for column in by)
+        select = ', '.join(f'{expression} AS {quote(name)}' for name, expression in aggregates.items())
+        return self.query(f'SELECT {group}, {select} FROM {table} {where} GROUP BY {group} ORDER BY {group}', params)
+
+    def grouped_sum(self, filters, by, column):
+        result = self.grouped(filters, [by], {column: f'SUM({quote(column)})'})
+        return result.set_index(by)[column]
+
+    def count_distinct(self, column):
+        # DuckDB has a HyperLogLog aggregate; SQLite always counts exactly
+        if self.distinct_mode == 'sketch' and self.engine == 'duckdb':
+            return f'approx_count_distinct({quote(column)})'
+        return f'COUNT(DISTINCT {quote(column)})'
+
+    def run(self, name, filters):
+        return getattr(self, name)(filters)
+
+    def filter_options(self):
+        return self.state['options']
+
+    def date_min(self):
+        return self.state['date_min']
+
+    def worksheet(self, filters, search='', min_quantity=1, page=0, page_size=WORKSHEET_PAGE_SIZE,
+                  sort=None, ascending=True, cache=None):
+        # The engine narrows searches itself; `cache` is accepted for interface parity
+        extra = [('"Quantity Ordered" >= ?', [int(min_quantity)])]
+        if search:
+            products = match_products(self.filter_options()['Product'], search)
+            if not products:
+                return pd.DataFrame(columns=WORKSHEET_COLUMNS), False
+            extra.append((f'"Product" IN ({", ".join("?" * len(products))})', products))
+        where, params = where_clause(filters, extra)
+        columns = ', '.join(quote(column) for column in WORKSHEET_COLUMNS)
+        order = 'rowid' if sort is None else f'{quote(sort)} {"ASC" if ascending else "DESC"}, rowid'
+        rows = self.query(f'SELECT {columns} FROM sales {where} ORDER BY {order} LIMIT ? OFFSET ?',
+                          params + [page_size + 1, page * page_size])
+        rows['Order Date'] = pd.to_datetime(rows['Order Date'])
+        return rows.head(page_size), len(rows) > page_size
+
+    def distinct_orders(self, filters, by=None):
+        if by is not None:
+            result = self.grouped(filters, [by], {'Order ID': self.count_distinct('Order ID')})
+            return result.set_index(by)['Order ID']
+        where, params = where_clause(filters)
+        return int(self.query(f'SELECT {self.count_distinct("Order ID")} AS n FROM sales {where}', params)['n'].iloc[0])
+
+    def totals(self, filters):
+        where, params = where_clause(filters)
+        row = self.query(f'SELECT SUM("Sales") AS s, SUM("Quantity Ordered") AS q, COUNT(*) AS n FROM sales {where}', params).iloc[0]
+        return {'Sales': float(row['s'] or 0), 'Quantity Ordered': int(row['q'] or 0), 'Order Lines': int(row['n'])}
+
+    def monthly_sales(self, filters):
+        return self.grouped_sum(filters, 'Month', 'Sales')
+
+    def hourly_sales(self, filters):
+        return self.grouped_sum(filters, 'Hour', 'Sales')
+
+    def day_sales(self, filters):
+        return self.grouped_sum(filters, 'Day_of_Week', 'Sales')
+
+    def city_sales(self, filters):
+        return self.grouped_sum(filters, 'City', 'Sales')
+
+    def product_sales(self, filters):
+        return self.grouped_sum(filters, 'Product', 'Sales')
+
+    def product_units(self, filters):
+        return self.grouped_sum(filters, 'Product', 'Quantity Ordered')
+
+    def heatmap(self, filters):
+        cells = self.grouped(filters, ['Day_of_Week', 'Hour'], {'Sales': 'SUM("Sales")'})
+        heatmap_data = cells.set_index(['Day_of_Week', 'Hour'])['Sales'].unstack(fill_value=0)
+        return heatmap_data.reindex(data_loader.DAY_NAMES)
+
+    def performance(self, filters, by):
+        return self.grouped(filters, [by], {
+            'Revenue': 'SUM("Sales")',
+            'Units': 'SUM("Quantity Ordered")',
+            'Orders': self.count_distinct('Order ID'),
+        })
+
+    def city_performance(self, filters):
+        return self.performance(filters, 'City')
+
+    def product_stats(self, filters):
+        return self.performance(filters, 'Product')
+
+    def series_sales(self, filters):
+        return self.grouped(filters, ['City', 'Product', 'Month'], {'Sales': 'SUM("Sales")'})
+
+    def daily_sales(self, filters):
+        daily = self.grouped(filters, ['Date'], {'Sales': 'SUM("Sales")'}, table='sales_daily')
+        daily['Date'] = pd.to_datetime(daily['Date'])
+        return daily.set_index('Date')['Sales']
@@ -0,0 +1,101 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ============================================
+# Query Result Cache
+# ============================================
+def result_nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(result_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_nbytes(item) for item in value.values())
+    return sys.getsizeof(value)
+
+def result_fingerprint(*results):
+    """A digest of the contents of query results, equal for equal results however they were computed."""
+    digest = hashlib.blake2b(digest_size=16)
+    for result in results:
+        if isinstance(result, (pd.DataFrame, pd.Series, pd.Index)):
+            names = result.columns if isinstance(result, pd.DataFrame) else [result.name]
+            digest.update(repr((type(result).__name__, list(names), result.shape)).encode())
+            digest.update(pd.util.hash_pandas_object(result).to_numpy().tobytes())
+        elif isinstance(result, np.ndarray):
+            digest.update(repr((result.dtype.str, result.shape)).encode())
+            digest.update(np.ascontiguousarray(result).tobytes())
+        else:
+            digest.update(repr(result).encode())
+    return digest.hexdigest()
+
+class QueryCache:
+    """Thread-safe LRU of query results, bounded by the total size of the results.
+
+    Results are shared between every caller that asks for the same key, so they
+    must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes, sizeof=result_nbytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """The cached result for ``key`` without computing it, or ``default``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Computed outside the lock so a slow query does not block other sessions
+        value = compute()
+        nbytes = self.sizeof(value)
+        if nbytes > self.max_bytes:
+            return value
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from test_data_loader import sales_rows, write_csv
+
+DASHBOARD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard.py')
+
+@pytest.fixture
+def app_env(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('REFRESH_INTERVAL_S', '0')
+    monkeypatch.setenv('LAZY_TABS', '0')
+    return tmp_path
+
+def test_loads_a_directory_of_csvs(app_env, monkeypatch):
+    rows = sales_rows(1200)
+    source = app_env / 'monthly'
+    source.mkdir()
+    for month, part in rows.groupby('Month'):
+        write_csv(part, source / f'Sales_{month:02d}_2019.csv')
+    monkeypatch.setenv('SALES_DATA_SOURCE', str(source))
+    for _ in range(2):  # the second run loads from the snapshots the first one wrote
+        at = AppTest.from_file(DASHBOARD, default_timeout=120).run()
+        assert not at.exception, [exception.value for exception in at.exception]
+        records = next(metric for metric in at.metric if metric.label == 'Total Records')
+        assert records.value == f'{len(rows):,}'
@@ -0,0 +1,145 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_loader
+
+def test_apply_schema_keeps_blank_integer_cells_missing():
+    df = pd.DataFrame({
+        'Order ID': [176558.0, np.nan, 176560.0],
+        'Quantity Ordered': [1.0, 2.0, np.nan],
+        'Month': [1, 2, 3],
+    })
+    typed = data_loader.apply_schema(df)
+    assert typed.dtypes.to_dict() == {'Order ID': 'Int32', 'Quantity Ordered': 'Int16', 'Month': 'int8'}
+    assert typed['Order ID'].isna().tolist() == [False, True, False]
+    assert typed['Quantity Ordered'].sum() == 3
+
+def test_apply_schema_widens_out_of_range_integers():
+    typed = data_loader.apply_schema(pd.DataFrame({'Order ID': [1.0, np.nan, 3e9]}))
+    assert typed['Order ID'].dtype == 'Int64'
+    assert typed['Order ID'].iloc[2] == 3_000_000_000
+
+def sales_rows(count=200, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, count), unit='min')
+    return pd.DataFrame({
+        'Order ID': rng.integers(100000, 100000 + count // 2, count),
+        'Product': rng.choice(['iPhone', 'Google Phone', 'Wired Headphones'], count),
+        'Quantity Ordered': rng.integers(1, 4, count),
+        'Price Each': rng.choice([11.99, 149.99, 700.0], count),
+        'Order Date': dates.strftime('%Y-%m-%d %H:%M:%S'),
+        'City': rng.choice([' Boston', ' Dallas', ' Seattle'], count),
+        'Month': dates.month,
+        'Hour': dates.hour,
+    })
+
+def write_csv(df, path):
+    df.to_csv(path, index=False)
+    return str(path)
+
+def test_summaries_keep_rows_with_missing_dimensions(tmp_path):
+    rows = sales_rows()
+    rows.loc[::7, 'City'] = None
+    rows.loc[::11, 'Product'] = None
+    rows.loc[::13, 'Order Date'] = None
+    df = data_loader.read_sales_csv(write_csv(rows, tmp_path / 'sales.csv'))
+    summaries = data_loader.build_summaries(df, with_sketches=False)
+    cube = summaries['cube']
+    assert cube['Order Lines'].sum() == len(df) == summaries['rows']
+    assert np.isclose(cube['Sales'].sum(), df['Sales'].sum())
+    assert cube['Quantity Ordered'].sum() == df['Quantity Ordered'].sum()
+    assert np.isclose(summaries['daily']['Sales'].sum(), df['Sales'].sum())
+    # Filters still select only rows that have the value
+    cube_index = data_loader.build_filter_index(cube)
+    boston = cube.take(data_loader.select_rows(cube_index, {'City': ' Boston'}))
+    assert boston['Order Lines'].sum() == (df['City'] == ' Boston').sum()
+
+def test_order_sketches_skip_blank_cells(tmp_path):
+    rows = sales_rows(2000)
+    rows.loc[::7, 'City'] = None
+    rows.loc[::11, 'Product'] = None
+    rows.loc[::13, 'Order ID'] = None
+    df = data_loader.read_sales_csv(write_csv(rows, tmp_path / 'sales.csv'))
+    sketches = data_loader.merge_sketches([data_loader.build_order_sketches(df[:900]),
+                                           data_loader.build_order_sketches(df[900:])])
+    exact = df['Order ID'].nunique()
+    assert abs(data_loader.sketch_distinct(sketches) - exact) <= 0.05 * exact
+    by_city = data_loader.sketch_distinct(sketches, by='City')
+    assert sorted(by_city.index) == [' Boston', ' Dallas', ' Seattle']
+    index = data_loader.build_filter_index(sketches['keys'])
+    dallas = data_loader.sketch_distinct(sketches, data_loader.select_rows(index, {'City': ' Dallas'}))
+    assert dallas == by_city[' Dallas']
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_rows_appended_during_a_load_are_ingested_once(tmp_path, monkeypatch, streaming):
+    rows = sales_rows(600)
+    path = write_csv(rows[:400], tmp_path / 'sales.csv')
+    take_watermark = data_loader.take_watermark
+
+    def append_after_watermark(*args, **kwargs):
+        # A writer appends between the watermark and the parse
+        watermark = take_watermark(*args, **kwargs)
+        rows[400:500].to_csv(path, mode='a', header=False, index=False)
+        monkeypatch.setattr(data_loader, 'take_watermark', take_watermark)
+        return watermark
+
+    monkeypatch.setattr(data_loader, 'take_watermark', append_after_watermark)
+    store = data_loader.SalesStore(path, streaming=streaming, snapshot_dir=str(tmp_path / 'cache'))
+    assert store.refresh()['summaries']['rows'] == 400
+    rows[500:].to_csv(path, mode='a', header=False, index=False)
+    appended = store.refresh()['summaries']
+
+    reload = data_loader.SalesStore(path, streaming=streaming, snapshot_dir=str(tmp_path / 'fresh'))
+    reloaded = reload.refresh()['summaries']
+    assert appended['rows'] == reloaded['rows'] == len(rows)
+    assert np.isclose(appended['cube']['Sales'].sum(), reloaded['cube']['Sales'].sum())
+    if not streaming:
+        assert len(store.state['df']) == len(rows)
+
+def test_snapshot_segments_match_their_sidecar(tmp_path):
+    rows = sales_rows(900)
+    path = write_csv(rows[:300], tmp_path / 'sales.csv')
+    snapshot_dir = str(tmp_path / 'cache')
+    data_loader.load_sales_file(path, snapshot_dir)
+    first = data_loader.current_snapshot_meta(path, snapshot_dir)
+    # Two writers extend the same snapshot with different appends; the last sidecar wins
+    for stop in (400, 500):
+        rows[300:stop].to_csv(tmp_path / 'part.csv', header=False, index=False)
+        with open(path, 'ab') as f:
+            f.truncate(first['size'])
+            f.write((tmp_path / 'part.csv').read_bytes())
+        df, _ = data_loader.load_snapshot(path, first, snapshot_dir)
+    meta = data_loader.current_snapshot_meta(path, snapshot_dir)
+    assert meta['size'] == os.path.getsize(path) and len(meta['segments']) == 2
+    assert len(data_loader.load_sales_file(path, snapshot_dir)[0]) == 500
+    # Compaction writes a new file; the old segments stay for a reader holding the old sidecar
+    for stop in range(550, 950, 50):
+        rows[stop - 50:stop].to_csv(path, mode='a', header=False, index=False)
+        df, _ = data_loader.load_sales_file(path, snapshot_dir)
+    assert len(df) == len(rows)
+    _, meta_file = data_loader.snapshot_paths(path, snapshot_dir)
+    assert len(data_loader.read_snapshot(data_loader.snapshot_files(meta_file, meta))) == 500
+    assert len(data_loader.current_snapshot_meta(path, snapshot_dir)['segments']) < data_loader.MAX_SNAPSHOT_SEGMENTS
+
+def test_replicas_map_one_published_frame(tmp_path):
+    rows = sales_rows(600)
+    path = write_csv(rows[:400], tmp_path / 'sales.csv')
+    cache = tmp_path / 'cache'
+    replicas = [data_loader.SalesStore(path, snapshot_dir=str(cache)) for _ in range(2)]
+    for store in replicas:
+        store.refresh()
+    # A single-file source publishes its snapshot segment rather than a second copy of the rows
+    meta = data_loader.read_snapshot_meta(data_loader.shared_paths([path], replicas[0].state['version'], str(cache))[1])
+    assert meta['data'] == data_loader.current_snapshot_meta(path, str(cache))['segments'][0]
+    assert not list(cache.glob('shared-*.arrow'))
+
+    rows[400:].to_csv(path, mode='a', header=False, index=False)
+    states = [store.refresh() for store in replicas]
+    assert len(list(cache.glob('shared-*.arrow'))) == 1
+    assert len(list(cache.glob('shared-*.npy'))) == len(data_loader.FILTER_COLUMNS)
+    assert [len(state['df']) for state in states] == [len(rows)] * 2
+    for column in data_loader.FILTER_COLUMNS:
+        assert states[0]['filter_index'][column].keys() == states[1]['filter_index'][column].keys()
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from formatting import fill_cards, format_currency, format_number
+
+EDGE_CASES = [
+    0.0, 0.004, 0.005, 0.015, 0.125, 0.5, 1.5, 2.5, 999.4, 999.5, 999.6, 999.994, 999.995, 999.996,
+    1e3, 1049.99, 1050.0, 1250.0, 999949.99, 999950.0, 999999.9, 1e6, 1.005e6, 2.675e6, 1e15, 1e20,
+    -0.001, -0.5, -999.5, -1000.4, -12345.6, -2.5e6, np.nan, np.inf, -np.inf,
+]
+
+def random_values(count=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.concatenate([
+        10 ** rng.uniform(-3, 13, count),
+        rng.uniform(-5e6, 5e7, count),
+        np.round(rng.uniform(0, 2e6, count), 2),  # cents, many of them halfway cases at one decimal
+        np.round(rng.uniform(0, 2e3, count), 3),
+        rng.integers(0, 10**7, count).astype(np.float64),
+    ])
+
+@pytest.mark.parametrize('formatter', [format_currency, format_number])
+@pytest.mark.parametrize('values', [np.array(EDGE_CASES), random_values()], ids=['edge', 'random'])
+def test_array_matches_scalar(formatter, values):
+    assert formatter(values).tolist() == [formatter(float(value)) for value in values]
+
+@pytest.mark.parametrize('formatter', [format_currency, format_number])
+def test_array_of_integers_and_empty_array(formatter):
+    values = np.array([0, 7, 999, 1000, 123456, 10**7], dtype=np.int64)
+    assert formatter(values).tolist() == [formatter(int(value)) for value in values]
+    assert formatter(np.empty(0)).tolist() == []
+
+def test_scalar_formats():
+    assert format_currency(1234567) == '$1.23M'
+    assert format_currency(4500) == '$4.5K'
+    assert format_currency(12.5) == '$12.50'
+    assert format_number(999.5) == '1,000'
+    assert isinstance(format_number(np.float64(3)), str)
+
+def test_fill_cards():
+    template = '<b>{name}</b>{value}%;'
+    assert fill_cards(template, name=['a', 'b'], value=np.array([1.5, 2.0])) == '<b>a</b>1.5%;<b>b</b>2.0%;'
+    assert fill_cards(template, name=np.array([], dtype=str), value='x') == ''
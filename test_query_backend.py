@@ -0,0 +1,36 @@
+import threading
+
+import query_backend
+from test_data_loader import sales_rows, write_csv
+
+def test_reruns_on_new_threads_reuse_pooled_connections(tmp_path, monkeypatch):
+    rows = sales_rows(300)
+    path = write_csv(rows[:200], tmp_path / 'sales.csv')
+    store = query_backend.SQLStore(str(tmp_path / 'sales.db'), 'sqlite', path)
+    store.refresh()
+    opened = []
+    connect_database = query_backend.connect_database
+    monkeypatch.setattr(query_backend, 'connect_database',
+                        lambda *args, **kwargs: opened.append(args[0]) or connect_database(*args, **kwargs))
+    totals = []
+
+    def rerun():
+        # Streamlit runs each rerun on a new thread with a backend over the store's current state
+        backend = query_backend.SQLBackend(store.state, 'exact', store.connections)
+        totals.append(backend.totals({})['Order Lines'])
+
+    def rerun_on_new_thread():
+        thread = threading.Thread(target=rerun)
+        thread.start()
+        thread.join()
+
+    for _ in range(3):
+        rerun_on_new_thread()
+    assert totals == [200] * 3 and opened == [store.state['database']]
+
+    rows[200:].to_csv(path, mode='a', header=False, index=False)
+    old = store.state['database']
+    store.refresh()
+    assert store.connections.idle == {store.state['database']: []}
+    rerun_on_new_thread()
+    assert totals[-1] == 300 and opened[-1] == store.state['database'] != old